@@ -0,0 +1,292 @@
+"""
+archive_reader.py
+
+ArchiveStreamer 类用于不落盘地读取压缩包（zip、tar/tar.gz/tar.bz2/tar.xz、7z）中的 evtx 文件。
+
+功能说明：
+- 后台线程按顺序解压压缩包中的 .evtx 成员，把解压数据切分为 64KB 的 chunk 放入有界队列，不写入磁盘。
+- 解压下一个成员与解析上一个成员并行进行；内存占用上限约为
+  (max_pending_members + 1) * max_buffered_chunks * 64KB。
+- 支持按文件名过滤成员（与 find_and_analyze_evtx_logs 的 need_result 一致）。
+- 7z 需要安装 py7zr（pip install py7zr），未安装时跳过 7z 文件并记录错误日志。
+
+使用示例：
+    with ArchiveStreamer("host01.zip") as streamer:
+        for member in streamer:
+            analyzer = EventLogAnalyzer(member.display_path, save_dir, backend='python')
+            analyzer.run(chunks=member.chunks())
+
+作者：
+日期：
+"""
+
+import os
+import queue
+import logging
+import tarfile
+import zipfile
+import threading
+import traceback
+
+from evtx_reader import ChunkSplitter, iter_chunk_buffers
+
+try:
+    import py7zr
+    from py7zr.io import Py7zIO, WriterFactory
+except ImportError:
+    py7zr = None
+    Py7zIO = WriterFactory = object
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_SUFFIXES = ('.zip', '.7z') + TAR_SUFFIXES
+
+_END = object()  # 成员或压缩包结束标记
+
+
+def is_archive(filename):
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_stem(filename):
+    """去掉压缩包后缀，host01.tar.gz -> host01"""
+    lower = filename.lower()
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if lower.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def safe_member_dir(member_name):
+    """成员所在目录的安全相对路径，去掉绝对路径和 .. 防止写出结果目录"""
+    parts = [p for p in member_name.replace('\\', '/').split('/')[:-1] if p not in ('', '.', '..')]
+    return os.path.join(*parts) if parts else ''
+
+
+class ArchiveMember:
+    def __init__(self, archive_path, name, chunk_queue, stop_event):
+        self.archive_path = archive_path
+        self.name = name
+        self.display_path = os.path.join(archive_path, name)
+        self._queue = chunk_queue
+        self._stop_event = stop_event
+        self._finished = False
+
+    def chunks(self):
+        """按顺序返回该成员的 chunk 缓冲区"""
+        while not self._finished:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return
+                continue
+            if item is _END:
+                self._finished = True
+                return
+            yield item
+
+    def drain(self):
+        """丢弃尚未读取的 chunk，让后台解压线程可以继续"""
+        for _ in self.chunks():
+            pass
+
+
+class _ChunkQueueWriter(Py7zIO):
+    """py7zr 解压时写入的目标：直接切分为 chunk 放入队列"""
+
+    def __init__(self, streamer, chunk_queue):
+        self.streamer = streamer
+        self.queue = chunk_queue
+        self.splitter = ChunkSplitter()
+        self.length = 0
+        self.closed = False
+
+    def write(self, s):
+        self.length += len(s)
+        if self.splitter.valid:
+            for chunk in self.splitter.feed(s):
+                self.streamer._put(self.queue, chunk)
+        return len(s)
+
+    def read(self, size=None):
+        return b''
+
+    def seek(self, offset, whence=0):
+        return self.length
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self.length
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.streamer._put(self.queue, _END)
+
+
+class _NullWriter(Py7zIO):
+    def write(self, s):
+        return len(s)
+
+    def read(self, size=None):
+        return b''
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return 0
+
+
+class _ChunkWriterFactory(WriterFactory):
+    def __init__(self, streamer, targets):
+        self.streamer = streamer
+        self.targets = targets
+        self.current = None
+
+    def create(self, filename):
+        # 旧版本 py7zr 不会调用 close()，开始下一个成员时结束上一个
+        self.finish()
+        if filename not in self.targets:
+            return _NullWriter()
+        chunk_queue = queue.Queue(maxsize=self.streamer.max_buffered_chunks)
+        self.streamer._put(self.streamer.members, ArchiveMember(self.streamer.archive_path, filename, chunk_queue,
+                                                                 self.streamer.stop_event))
+        self.current = _ChunkQueueWriter(self.streamer, chunk_queue)
+        return self.current
+
+    def finish(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+
+class ArchiveStreamer:
+    def __init__(self, archive_path, need_result=None, max_buffered_chunks=64, max_pending_members=1,
+                 read_size=1 << 20):
+        """
+        :param archive_path: 压缩包路径
+        :param need_result: 只读取文件名（小写）在此集合中的 evtx 成员，None 表示全部
+        :param max_buffered_chunks: 每个成员最多缓存的 chunk 数
+        :param max_pending_members: 最多提前解压的成员数
+        :param read_size: zip/tar 每次读取的解压数据大小
+        """
+        self.archive_path = archive_path
+        self.need_result = need_result
+        self.max_buffered_chunks = max_buffered_chunks
+        self.read_size = read_size
+        self.members = queue.Queue(maxsize=max_pending_members)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._produce, name="ArchiveReader")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            member = self.members.get()
+            if member is _END:
+                return
+            try:
+                yield member
+            finally:
+                member.drain()
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _wanted(self, name):
+        basename = name.replace('\\', '/').rsplit('/', 1)[-1].lower()
+        if not basename.endswith('.evtx'):
+            return False
+        return self.need_result is None or basename in self.need_result
+
+    def _put(self, q, item):
+        """阻塞放入队列，消费端关闭后放弃"""
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise InterruptedError("ArchiveStreamer closed")
+
+    # ---------- 解压线程 ----------
+
+    def _produce(self):
+        try:
+            lower = self.archive_path.lower()
+            if lower.endswith('.zip'):
+                self._produce_zip()
+            elif lower.endswith('.7z'):
+                self._produce_7z()
+            else:
+                self._produce_tar()
+        except InterruptedError:
+            return
+        except Exception as e:
+            logging.error(f"Failed to read archive {self.archive_path}: {e}")
+            logging.error(traceback.format_exc())
+
+        try:
+            self._put(self.members, _END)
+        except InterruptedError:
+            pass
+
+    def _stream_member(self, name, fileobj):
+        chunk_queue = queue.Queue(maxsize=self.max_buffered_chunks)
+        self._put(self.members, ArchiveMember(self.archive_path, name, chunk_queue, self.stop_event))
+        try:
+            for chunk in iter_chunk_buffers(fileobj, self.read_size):
+                self._put(chunk_queue, chunk)
+        except InterruptedError:
+            raise
+        except Exception as e:
+            logging.error(f"Failed to read {name} in {self.archive_path}: {e}")
+        self._put(chunk_queue, _END)
+
+    def _produce_zip(self):
+        with zipfile.ZipFile(self.archive_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not self._wanted(info.filename):
+                    continue
+                with zf.open(info) as fileobj:
+                    self._stream_member(info.filename, fileobj)
+
+    def _produce_tar(self):
+        # 'r|*' 为流式模式，只顺序读一遍压缩包
+        with tarfile.open(self.archive_path, mode='r|*') as tf:
+            for info in tf:
+                if not info.isfile() or not self._wanted(info.name):
+                    continue
+                fileobj = tf.extractfile(info)
+                if fileobj is not None:
+                    self._stream_member(info.name, fileobj)
+
+    def _produce_7z(self):
+        if py7zr is None:
+            raise ImportError("Reading .7z archives requires py7zr: pip install py7zr")
+        with py7zr.SevenZipFile(self.archive_path, mode='r') as archive:
+            targets = [name for name in archive.getnames() if self._wanted(name)]
+            if not targets:
+                return
+            factory = _ChunkWriterFactory(self, set(targets))
+            try:
+                archive.extract(targets=targets, factory=factory)
+            finally:
+                # 出错时也要结束当前成员，否则消费端会一直等待
+                factory.finish()
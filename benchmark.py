@@ -0,0 +1,347 @@
+"""
+benchmark.py
+
+吞吐量基准测试，基于 evtx_generator 生成的合成日志，结果保存为 JSON，便于跨提交比较性能回退。
+
+功能说明：
+- 按记录数规模（如 10^5 ~ 10^8）生成并缓存测试数据，超过单文件上限的规模拆分为多个主机目录下的 Security.evtx。
+- 测试项：
+  1. handler：各事件处理器 handle() 的吞吐和单次调用延迟分位数（不含解析时间）。
+  2. analyzer：EventLogAnalyzer.run() 的吞吐（数据拆分为多个文件时逐个文件运行后汇总），以及队列等待和处理器耗时
+     （来自 PipelineMetrics）。
+  3. finder：find_and_analyze_evtx_logs 处理整个目录的吞吐和每个文件的耗时。
+- 每个测试项在独立子进程中运行，记录每秒记录数、峰值内存（RSS）和延迟。
+- 结果文件包含提交号、Python 版本、平台等信息；--compare 比较两次结果并列出吞吐下降超过阈值的测试项。
+
+使用示例：
+    python benchmark.py --sizes 100000 1000000 --output bench_results
+    python benchmark.py --compare bench_results/old.json bench_results/new.json --threshold 0.1
+
+作者：
+日期：
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from evtx_generator import generate_evtx, parse_event_mix, DEFAULT_EVENT_MIX
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，峰值内存改用 psutil（如已安装）
+    resource = None
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s][%(levelname)s] %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+HANDLER_EVENT_IDS = (4625, 18456, 7045, 4688, 5156)
+
+
+def make_handler(event_id):
+    from handle import Event4625Handler, Event18456Handler, Event7045Handler, Event4688Handler, Event5156Handler
+    return {
+        4625: Event4625Handler,
+        18456: Event18456Handler,
+        7045: Event7045Handler,
+        4688: Event4688Handler,
+        5156: Event5156Handler,
+    }[event_id]()
+
+
+def peak_rss_bytes():
+    """当前进程的峰值内存（字节），无法获取时返回 None"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except Exception:
+        return None
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    last = len(samples) - 1
+    return {
+        'p50': samples[int(last * 0.50)],
+        'p95': samples[int(last * 0.95)],
+        'p99': samples[int(last * 0.99)],
+        'max': samples[-1],
+    }
+
+
+# ---------- 测试数据 ----------
+
+def ensure_fixture(work_dir, size, records_per_file, gen_options):
+    """生成（或复用已缓存的）size 条记录的测试目录，返回 (目录, 文件列表)"""
+    fixture_dir = os.path.join(work_dir, 'fixtures', str(size))
+    marker_path = os.path.join(fixture_dir, 'fixture.json')
+    marker = {'size': size, 'records_per_file': records_per_file, 'options': gen_options}
+
+    if os.path.exists(marker_path):
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == marker:
+                return fixture_dir, _fixture_files(fixture_dir)
+        shutil.rmtree(fixture_dir)
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    remaining = size
+    index = 0
+    while remaining > 0:
+        count = min(remaining, records_per_file)
+        host_dir = os.path.join(fixture_dir, f"host{index:04d}")
+        os.makedirs(host_dir, exist_ok=True)
+        generate_evtx(
+            os.path.join(host_dir, "Security.evtx"), count,
+            event_mix={int(k): v for k, v in gen_options['event_mix'].items()},
+            ip_count=gen_options['ip_count'], user_count=gen_options['user_count'],
+            process_count=gen_options['process_count'], computer=f"HOST-{index:04d}",
+            seed=gen_options['seed'] + index,
+        )
+        remaining -= count
+        index += 1
+
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump(marker, f)
+    return fixture_dir, _fixture_files(fixture_dir)
+
+
+def _fixture_files(fixture_dir):
+    files = []
+    for dirpath, _, filenames in os.walk(fixture_dir):
+        files.extend(os.path.join(dirpath, name) for name in filenames if name.endswith('.evtx'))
+    return sorted(files)
+
+
+# ---------- 测试项（在子进程中运行） ----------
+
+def bench_handler(files, event_id, latency_sample_limit=1000000):
+    """流式读取测试文件，只对 handle() 计时"""
+    from evtx_reader import EvtxFileReader
+
+    handler = make_handler(event_id)
+    latencies = []
+    handled = 0
+    handle_time = 0.0
+    for path in files:
+        with EvtxFileReader(path) as reader:
+            for chunk in reader.iter_chunks():
+                for offset in chunk.record_offsets():
+                    if chunk.event_id(offset) != event_id:
+                        continue
+                    record = chunk.parse_record(offset)
+                    start = time.perf_counter()
+                    handler.handle(record)
+                    elapsed = time.perf_counter() - start
+                    handle_time += elapsed
+                    handled += 1
+                    if len(latencies) < latency_sample_limit:
+                        latencies.append(elapsed)
+
+    return {
+        'records': handled,
+        'elapsed': handle_time,
+        'records_per_second': handled / handle_time if handle_time > 0 else 0.0,
+        'latency': percentiles(latencies),
+    }
+
+
+def bench_analyzer(paths, output_dir, num_producers, num_workers):
+    """依次对每个文件运行 EventLogAnalyzer，共用一个 PipelineMetrics 汇总吞吐"""
+    from event_log_analyzer import EventLogAnalyzer
+    from metrics import PipelineMetrics
+
+    metrics = PipelineMetrics()
+    elapsed = 0.0
+    for i, path in enumerate(paths):
+        analyzer = EventLogAnalyzer(path, os.path.join(output_dir, str(i)), metrics=metrics)
+        for event_id in HANDLER_EVENT_IDS:
+            analyzer.register_handler(event_id, make_handler(event_id))
+
+        # 只统计 run() 的时间，不含创建分析器和注册处理器
+        start = time.perf_counter()
+        analyzer.run(num_producers=num_producers, num_workers=num_workers)
+        elapsed += time.perf_counter() - start
+
+    snapshot = metrics.snapshot()
+    scanned = snapshot['counters']['scanned']
+    return {
+        'records': scanned,
+        'files': len(paths),
+        'elapsed': elapsed,
+        'records_per_second': scanned / elapsed if elapsed > 0 else 0.0,
+        'latency': {
+            'queue_wait': snapshot['queue_wait'],
+            'put_block': snapshot['put_block'],
+            'handler_time': snapshot['handler_time'],
+        },
+        'counters': snapshot['counters'],
+    }
+
+
+def bench_finder(root_dir, output_dir):
+    from log_finder import find_and_analyze_evtx_logs
+    from metrics import PipelineMetrics
+
+    metrics = PipelineMetrics()
+    start = time.perf_counter()
+    find_and_analyze_evtx_logs(root_dir, output_dir, target_event_ids=list(HANDLER_EVENT_IDS), metrics=metrics)
+    elapsed = time.perf_counter() - start
+
+    snapshot = metrics.snapshot()
+    scanned = snapshot['counters']['scanned']
+    file_times = [info['elapsed'] for info in snapshot['files'].values()]
+    return {
+        'records': scanned,
+        'elapsed': elapsed,
+        'records_per_second': scanned / elapsed if elapsed > 0 else 0.0,
+        'latency': {'per_file': percentiles(file_times)},
+        'counters': snapshot['counters'],
+    }
+
+
+def _run_case(func_name, kwargs):
+    """子进程入口：运行一个测试项，并附上峰值内存"""
+    logging.getLogger().setLevel(logging.WARNING)
+    result = globals()[func_name](**kwargs)
+    result['peak_rss_bytes'] = peak_rss_bytes()
+    return result
+
+
+def run_case(func_name, **kwargs):
+    # 每个测试项使用新的子进程，峰值内存互不影响
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_run_case, func_name, kwargs).result()
+
+
+# ---------- 结果 ----------
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args):
+    gen_options = {
+        'event_mix': {str(k): v for k, v in (args.mix or DEFAULT_EVENT_MIX).items()},
+        'ip_count': args.ips,
+        'user_count': args.users,
+        'process_count': args.processes,
+        'seed': args.seed,
+    }
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': {
+            'sizes': args.sizes,
+            'records_per_file': args.records_per_file,
+            'producers': args.producers,
+            'workers': args.workers,
+            'generator': gen_options,
+        },
+        'cases': [],
+    }
+
+    for size in args.sizes:
+        fixture_dir, files = ensure_fixture(args.work_dir, size, args.records_per_file, gen_options)
+        output_root = os.path.join(args.work_dir, 'output', str(size))
+
+        cases = []
+        if 'handler' in args.cases:
+            for event_id in HANDLER_EVENT_IDS:
+                cases.append((f"handler_{event_id}", 'bench_handler', {'files': files, 'event_id': event_id}))
+        if 'analyzer' in args.cases:
+            cases.append(('analyzer', 'bench_analyzer', {
+                'paths': files, 'output_dir': os.path.join(output_root, 'analyzer'),
+                'num_producers': args.producers, 'num_workers': args.workers,
+            }))
+        if 'finder' in args.cases:
+            cases.append(('finder', 'bench_finder', {
+                'root_dir': fixture_dir, 'output_dir': os.path.join(output_root, 'finder'),
+            }))
+
+        for name, func_name, kwargs in cases:
+            logging.info(f"Running {name} with {size} records")
+            result = run_case(func_name, **kwargs)
+            result.update({'name': name, 'size': size})
+            results['cases'].append(result)
+            logging.info(f"{name}[{size}]: {result['records_per_second']:.0f} records/s, "
+                         f"peak RSS {result['peak_rss_bytes']}")
+
+    os.makedirs(args.output, exist_ok=True)
+    commit = (results['commit'] or 'nocommit')[:12]
+    file_path = os.path.join(args.output, f"bench_{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    logging.info(f"Benchmark results saved to: {file_path}")
+    return file_path
+
+
+def compare_results(old_path, new_path, threshold):
+    """比较两次结果，返回吞吐下降超过 threshold（比例）的测试项"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = {(c['name'], c['size']): c for c in json.load(f)['cases']}
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = {(c['name'], c['size']): c for c in json.load(f)['cases']}
+
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        old_rate = old[key]['records_per_second']
+        new_rate = new[key]['records_per_second']
+        change = (new_rate - old_rate) / old_rate if old_rate else 0.0
+        print(f"{key[0]:<16} {key[1]:>12} {old_rate:>14.0f} -> {new_rate:>14.0f} records/s ({change:+.1%})")
+        if change < -threshold:
+            regressions.append((key, change))
+
+    for key, change in regressions:
+        logging.warning(f"Regression: {key[0]}[{key[1]}] throughput {change:+.1%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EventLogAnalyzer throughput benchmarks")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[100000],
+                        help="record counts to benchmark, e.g. 100000 1000000 10000000 100000000")
+    parser.add_argument("--cases", nargs='+', default=['handler', 'analyzer', 'finder'],
+                        choices=['handler', 'analyzer', 'finder'])
+    parser.add_argument("--work-dir", default="bench_data", help="cached fixtures and analysis output")
+    parser.add_argument("--output", default="bench_results", help="directory for result JSON files")
+    parser.add_argument("--records-per-file", type=int, default=1000000)
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mix", type=parse_event_mix, default=None, help="e.g. 4625=0.7,4688=0.3")
+    parser.add_argument("--ips", type=int, default=100)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs=2, metavar=('OLD', 'NEW'), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="regression threshold for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare_results(args.compare[0], args.compare[1], args.threshold) else 0)
+    run_benchmarks(args)
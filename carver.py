@@ -0,0 +1,239 @@
+"""
+carver.py
+
+EvtxCarver 类用于从原始磁盘镜像、pagefile、未分配空间等数据中恢复 evtx chunk 和记录。
+
+功能说明：
+- 日志被清除或文件损坏时，EventLogAnalyzer.get_log_info 无法读取，但旧的 chunk 往往仍残留在磁盘上。
+- 以 mmap 方式打开镜像文件（可达数十GB），按固定大小分段，由多个进程并行查找 ElfChnk 签名，
+  扫描速度接近磁盘读取速度。
+- 每个候选 chunk 校验头部 CRC32 和记录数据 CRC32；校验失败的 chunk 逐条校验记录（记录魔数、长度和尾部
+  长度副本），恢复其中连续完整的记录。
+- 同一个 chunk 在镜像中经常出现多份（当前文件、旧副本、pagefile），相同的 chunk 只输出一次；
+  同一 chunk 在不同时刻的版本（记录数不同）由 RecordDeduplicator 按记录去重。
+- 恢复的 chunk 以 chunk 流的形式交给 EventLogAnalyzer.run(chunks=...)，由已注册的处理器分析。
+
+使用示例：
+    carver = EvtxCarver(r"D:\\images\\disk.dd", processes=8)
+    analyzer = EventLogAnalyzer(r"D:\\images\\disk.dd", save_dir, backend='python')
+    analyzer.register_handler(4625, Event4625Handler())
+    analyzer.run(chunks=carver.iter_chunks())
+    print(carver.stats, analyzer.read_errors)
+
+    python carver.py disk.dd 分析结果目录 --events 4625 4688 --processes 8
+
+作者：
+日期：
+"""
+
+import os
+import mmap
+import time
+import zlib
+import struct
+import logging
+import argparse
+import traceback
+import collections
+import multiprocessing
+
+from evtx_reader import CHUNK_MAGIC, CHUNK_SIZE, CHUNK_HEADER_SIZE, RECORD_MAGIC, verify_chunk
+
+# 扫描进程中打开的镜像，由 _init_scan_worker 初始化，每个进程只打开一次
+_worker_file = None
+_worker_buf = None
+
+
+def salvage_chunk(buf, offset):
+    """
+    校验失败的 chunk：从第一条记录开始逐条校验魔数、长度和尾部长度副本，
+    返回修正了记录范围和 next_record_offset 的 chunk 副本；没有完整记录时返回 None
+    """
+    ofs = offset + CHUNK_HEADER_SIZE
+    limit = offset + CHUNK_SIZE
+    first = last = None
+    while ofs + 0x1C <= limit:
+        magic, size, record_id = struct.unpack_from('<IIQ', buf, ofs)
+        if magic != RECORD_MAGIC or size < 0x1C or ofs + size > limit:
+            break
+        if struct.unpack_from('<I', buf, ofs + size - 4)[0] != size:
+            break
+        if first is None or record_id < first:
+            first = record_id
+        if last is None or record_id > last:
+            last = record_id
+        ofs += size
+
+    if first is None:
+        return None
+    chunk = bytearray(buf[offset:offset + CHUNK_SIZE])
+    struct.pack_into('<QQ', chunk, 0x18, first, last)
+    struct.pack_into('<I', chunk, 0x30, ofs - offset)
+    return bytes(chunk)
+
+
+def _init_scan_worker(image_path):
+    global _worker_file, _worker_buf
+    _worker_file = open(image_path, 'rb')
+    _worker_buf = mmap.mmap(_worker_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _scan_segment(segment):
+    """
+    扫描进程：查找起始位置在 [start, end) 内的 ElfChnk 签名。
+    返回 (start, end, [(偏移, 是否需要恢复), ...], 被丢弃的候选数)。
+    只返回偏移而不返回 chunk 数据，结果很小；需要恢复的 chunk 由主进程重新调用 salvage_chunk。
+    """
+    start, end = segment
+    buf = _worker_buf
+    limit = len(buf) - CHUNK_SIZE
+    # 跨越分段边界的签名：起始位置在本段内即属于本段
+    search_end = min(end + len(CHUNK_MAGIC) - 1, len(buf))
+    found = []
+    rejected = 0
+    pos = buf.find(CHUNK_MAGIC, start, search_end)
+    while pos != -1:
+        if pos > limit:
+            # 镜像末尾被截断的 chunk
+            rejected += 1
+            break
+        try:
+            if verify_chunk(buf, pos):
+                found.append((pos, False))
+            elif salvage_chunk(buf, pos) is not None:
+                found.append((pos, True))
+            else:
+                rejected += 1
+        except Exception as e:
+            rejected += 1
+            logging.debug(f"Failed to check chunk candidate at {pos:#x}: {e}")
+        pos = buf.find(CHUNK_MAGIC, pos + 8, search_end)
+    return start, end, found, rejected
+
+
+class EvtxCarver:
+    def __init__(self, image_path, processes=None, segment_size=64 << 20, salvage=True, progress_interval=10.0,
+                 max_pending_segments=None):
+        """
+        :param image_path: 原始镜像、pagefile 等文件路径
+        :param processes: 并行扫描的进程数，默认 CPU 核数
+        :param segment_size: 每个扫描任务的字节数
+        :param max_pending_segments: 最多同时扫描或等待解析的分段数，默认进程数的2倍；
+                                     扫描远快于解析，限制提前扫描的分段数，避免结果在主进程中堆积
+        :param salvage: 是否恢复校验失败的 chunk 中的完整记录，False 时只输出校验通过的 chunk
+        :param progress_interval: 输出扫描进度日志的间隔秒数
+        """
+        self.image_path = image_path
+        self.processes = processes or os.cpu_count() or 1
+        self.segment_size = max(segment_size, CHUNK_SIZE)
+        self.salvage = salvage
+        self.progress_interval = progress_interval
+        self.max_pending_segments = max_pending_segments or self.processes * 2
+        self.stats = {
+            'bytes_scanned': 0,
+            'chunks_valid': 0,
+            'chunks_salvaged': 0,
+            'chunks_duplicate': 0,
+            'candidates_rejected': 0,
+        }
+
+    def segments(self, size):
+        return [(start, min(start + self.segment_size, size)) for start in range(0, size, self.segment_size)]
+
+    def iter_chunks(self):
+        """
+        按镜像中的偏移顺序返回恢复的 chunk 缓冲区（64KB bytes），可直接传给 EventLogAnalyzer.run(chunks=...)。
+        扫描在后台进程中进行，与记录解析并行。
+        """
+        size = os.path.getsize(self.image_path)
+        if size < CHUNK_SIZE:
+            return
+
+        seen = set()
+        start_time = last_report = time.time()
+        with open(self.image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pool = multiprocessing.Pool(self.processes, initializer=_init_scan_worker, initargs=(self.image_path,))
+            segments = iter(self.segments(size))
+            pending = collections.deque()
+            try:
+                for segment in segments:
+                    pending.append(pool.apply_async(_scan_segment, (segment,)))
+                    if len(pending) >= self.max_pending_segments:
+                        break
+
+                while pending:
+                    start, end, found, rejected = pending.popleft().get()
+                    # 取走一个结果后才提交下一个分段，按偏移顺序输出
+                    segment = next(segments, None)
+                    if segment is not None:
+                        pending.append(pool.apply_async(_scan_segment, (segment,)))
+
+                    self.stats['bytes_scanned'] += end - start
+                    self.stats['candidates_rejected'] += rejected
+                    for offset, damaged in found:
+                        chunk = self._take_chunk(buf, offset, damaged, seen)
+                        if chunk is not None:
+                            yield chunk
+
+                    now = time.time()
+                    if now - last_report >= self.progress_interval:
+                        last_report = now
+                        self._log_progress(size, now - start_time)
+            finally:
+                # 消费端提前停止时也要结束扫描进程
+                pool.terminate()
+                pool.join()
+
+        self._log_progress(size, time.time() - start_time)
+
+    def _take_chunk(self, buf, offset, damaged, seen):
+        """去掉重复出现的 chunk，返回需要分析的 chunk 副本"""
+        if not damaged:
+            chunk = bytes(buf[offset:offset + CHUNK_SIZE])
+            # 校验通过的 chunk 由头部和数据的 CRC32 唯一确定
+            key = ('valid', chunk[0x7C:0x80], chunk[0x34:0x38], chunk[0x18:0x28])
+            kind = 'chunks_valid'
+        elif self.salvage:
+            chunk = salvage_chunk(buf, offset)
+            key = ('salvaged', zlib.crc32(chunk), chunk[0x18:0x28])
+            kind = 'chunks_salvaged'
+        else:
+            return None
+
+        if key in seen:
+            self.stats['chunks_duplicate'] += 1
+            return None
+        seen.add(key)
+        self.stats[kind] += 1
+        return chunk
+
+    def _log_progress(self, size, elapsed):
+        scanned = self.stats['bytes_scanned']
+        rate = scanned / elapsed / (1 << 20) if elapsed > 0 else 0.0
+        logging.info(f"Carving {self.image_path}: {scanned >> 20}/{size >> 20} MB ({rate:.1f} MB/s), "
+                     f"{self.stats['chunks_valid']} valid chunks, {self.stats['chunks_salvaged']} salvaged, "
+                     f"{self.stats['chunks_duplicate']} duplicates, "
+                     f"{self.stats['candidates_rejected']} rejected candidates")
+
+
+if __name__ == "__main__":
+    from log_finder import analyze_image
+
+    parser = argparse.ArgumentParser(description="Carve EVTX chunks from a raw image and analyze them")
+    parser.add_argument("image")
+    parser.add_argument("output")
+    parser.add_argument("--events", type=int, nargs='+', default=[4625])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--segment-mb", type=int, default=64)
+    parser.add_argument("--no-salvage", action="store_true", help="only keep chunks whose checksums are valid")
+    parser.add_argument("--no-dedup", action="store_true", help="keep records that appear in several chunk versions")
+    args = parser.parse_args()
+
+    try:
+        stats = analyze_image(args.image, args.output, args.events, processes=args.processes,
+                              segment_size=args.segment_mb << 20, salvage=not args.no_salvage,
+                              dedup=not args.no_dedup)
+        logging.info(f"Carving finished: {stats}")
+    except Exception as e:
+        logging.error(f"Carving failed: {e}")
+        logging.error(traceback.format_exc())
@@ -0,0 +1,582 @@
+"""
+cluster.py
+
+Coordinator 和 AnalysisWorker 用于把一批日志的分析分发到多个分析节点（本机多个进程或其他机器）上并行进行。
+
+功能说明：
+- Coordinator 递归查找 evtx 文件，按 chunk 范围切分为工作单元（大文件拆为多个单元），通过 TCP（asyncio）
+  分发给已连接的 worker，每个 worker 同一时刻处理一个单元。
+- 工作单元中直接携带 chunk 原始数据，worker 不需要访问协调节点的文件系统，可以运行在其他机器上。
+- worker 用纯 Python 后端分析收到的 chunk，把各处理器的部分结果（export_result）发回；协调节点按目录合并
+  （merge_result），输出与 find_and_analyze_evtx_logs 相同目录结构的报告，同一目录下的多个文件合并为一份报告。
+- 单元处理出错、超时或 worker 断开时重新分配给其他 worker，超过重试次数后记录错误日志并跳过。
+- 本机 worker 进程退出后自动重启（有次数上限）；worker 与协调节点断开后自动重连。
+- 没有可用的 worker（超过等待时间）或超过总时限时，剩余单元记为失败，run() 正常返回。
+- 可选共享令牌（token）拒绝未授权的 worker；消息只使用 JSON，不反序列化任意对象。
+
+协议：
+    每条消息为 4 字节大端长度 + UTF-8 JSON 头部，头部中 payload_size 不为 0 时紧跟对应长度的二进制数据。
+    worker -> 协调节点：hello（name、token）、result（unit_id、results、stats）、error（unit_id、error）
+    协调节点 -> worker：unit（unit_id、path、target_event_ids，payload 为 chunk 数据）、shutdown、rejected
+
+使用示例：
+    # 协调节点，同时在本机启动 4 个 worker
+    python cluster.py coordinator 日志根目录 分析结果目录 --events 4625 4688 --local-workers 4
+    # 其他机器上的 worker（协调节点需 --host 0.0.0.0 监听）
+    python cluster.py coordinator 日志根目录 分析结果目录 --host 0.0.0.0 --port 9100 --token secret
+    python cluster.py worker 10.0.0.5:9100 --token secret
+
+作者：
+日期：
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import traceback
+import multiprocessing
+
+from event_log_analyzer import EventLogAnalyzer
+from evtx_reader import CHUNK_MAGIC, CHUNK_SIZE, FILE_HEADER_SIZE
+from log_finder import create_handlers, register_handlers
+from metrics import PipelineMetrics
+
+HEADER_STRUCT = struct.Struct('>I')
+# 结果消息的头部中带有各处理器导出的部分结果，单元越大头部越大；超过上限的消息视为异常
+MAX_HEADER_SIZE = 64 << 20
+# 通过令牌校验之前只接受很小的 hello 消息，未授权的连接不能让协调节点分配大块内存
+HELLO_MAX_SIZE = 64 << 10
+
+
+async def send_message(writer, header, payload=b''):
+    data = json.dumps(dict(header, payload_size=len(payload)), ensure_ascii=False).encode('utf-8')
+    if len(data) > MAX_HEADER_SIZE:
+        # 对端会拒绝读取，发送前检查，由调用方改为发送错误消息
+        raise ValueError(f"Message header too large: {len(data)} bytes, use fewer chunks per unit")
+    writer.write(HEADER_STRUCT.pack(len(data)) + data)
+    if payload:
+        writer.write(payload)
+    await writer.drain()
+
+
+async def read_message(reader, max_header_size=MAX_HEADER_SIZE, max_payload_size=None):
+    """
+    读取一条消息，返回 (头部, payload)
+    :param max_header_size: 头部的最大字节数，超过时不读取头部，直接抛出 ValueError
+    :param max_payload_size: payload 的最大字节数，None 表示不限制
+    """
+    size = HEADER_STRUCT.unpack(await reader.readexactly(HEADER_STRUCT.size))[0]
+    if size > max_header_size:
+        raise ValueError(f"Message header too large: {size} bytes")
+    header = json.loads(await reader.readexactly(size))
+    if not isinstance(header, dict):
+        raise ValueError("Message header is not a JSON object")
+    payload_size = header.get('payload_size', 0)
+    if not isinstance(payload_size, int) or payload_size < 0:
+        raise ValueError(f"Invalid payload size: {payload_size!r}")
+    if max_payload_size is not None and payload_size > max_payload_size:
+        raise ValueError(f"Message payload too large: {payload_size} bytes")
+    payload = await reader.readexactly(payload_size) if payload_size else b''
+    return header, payload
+
+
+class WorkUnit:
+    """一个文件中 [start, end) 字节范围内的 chunk"""
+
+    def __init__(self, unit_id, path, save_dir, start, end):
+        self.unit_id = unit_id
+        self.path = path
+        self.save_dir = save_dir
+        self.start = start
+        self.end = end
+        self.attempts = 0
+        self.done = False
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self.start)
+            return f.read(self.end - self.start)
+
+    def __repr__(self):
+        return f"WorkUnit({self.unit_id}, {self.path}, {self.start:#x}-{self.end:#x})"
+
+
+class Coordinator:
+    def __init__(self, root_log_dir, analysis_root_dir, target_event_ids=None, need_result=None, host="127.0.0.1",
+                 port=0, token=None, chunks_per_unit=256, max_retries=3, unit_timeout=600.0, metrics=None,
+                 worker_wait_timeout=300.0, deadline=None, max_respawns=None):
+        """
+        :param root_log_dir: 日志根目录，递归查找evtx文件
+        :param analysis_root_dir: 分析结果根目录，保存结果时保持相对路径结构
+        :param target_event_ids: 需要分析的事件ID列表，默认只分析4625
+        :param need_result: 只分析文件名在此列表中的日志文件，None 表示全部
+        :param host: 监听地址，默认只允许本机 worker 连接；其他机器上的 worker 需要监听 0.0.0.0
+        :param port: 监听端口，0 表示随机端口（启动后见 self.port）
+        :param token: worker 连接时需要提供的共享令牌，None 表示不校验
+        :param chunks_per_unit: 每个工作单元包含的 chunk 数（每个 chunk 64KB）
+        :param max_retries: 单元失败后的最大重试次数
+        :param unit_timeout: 等待 worker 返回单元结果的超时秒数
+        :param metrics: 可选的 PipelineMetrics 实例，汇总各 worker 返回的计数和各文件进度
+        :param worker_wait_timeout: 没有任何已连接的 worker 时最多等待的秒数，超过后剩余单元记为失败
+        :param deadline: 整体时限秒数，超过后剩余单元记为失败，None 表示不限制
+        :param max_respawns: 本机 worker 进程退出后最多重启的次数，默认 本机worker数 * (max_retries + 1)
+        """
+        self.root_log_dir = root_log_dir
+        self.analysis_root_dir = analysis_root_dir
+        self.target_event_ids = list(target_event_ids or [4625])
+        self.need_result = set(name.lower() for name in need_result) if need_result is not None else None
+        self.host = host
+        self.port = port
+        self.token = token
+        self.chunks_per_unit = max(chunks_per_unit, 1)
+        self.max_retries = max_retries
+        self.unit_timeout = unit_timeout
+        self.metrics = metrics
+        self.worker_wait_timeout = worker_wait_timeout
+        self.deadline = deadline
+        self.max_respawns = max_respawns
+
+        self.handlers = {}  # {save_dir: {event_id: handler}}
+        self.failed_units = []
+        self.file_units = {}  # {path: 尚未完成的单元数}
+        self.outstanding = {}  # {unit_id: 尚未完成的单元}
+        self.remaining = 0
+        self.queue = None
+        self.all_done = None
+        self.writers = set()  # 已通过校验的 worker 连接
+        self.retried_units = 0
+        self.rejected_workers = 0
+        self.respawned_workers = 0
+
+    # ---------- 切分工作单元 ----------
+
+    def plan_units(self):
+        units = []
+        for dirpath, _, filenames in os.walk(self.root_log_dir):
+            for filename in filenames:
+                if not filename.lower().endswith('.evtx'):
+                    continue
+                if self.need_result is not None and filename.lower() not in self.need_result:
+                    continue
+
+                full_log_path = os.path.join(dirpath, filename)
+                rel_dir = os.path.dirname(os.path.relpath(full_log_path, self.root_log_dir))
+                save_dir = os.path.join(self.analysis_root_dir, rel_dir)
+
+                # 按物理位置切分，不读取文件头（可能过期或被清除），魔数不正确的 chunk 由 worker 跳过
+                size = os.path.getsize(full_log_path)
+                step = self.chunks_per_unit * CHUNK_SIZE
+                file_units = 0
+                for start in range(FILE_HEADER_SIZE, size - CHUNK_SIZE + 1, step):
+                    end = min(start + step, FILE_HEADER_SIZE + (size - FILE_HEADER_SIZE) // CHUNK_SIZE * CHUNK_SIZE)
+                    units.append(WorkUnit(len(units), full_log_path, save_dir, start, end))
+                    file_units += 1
+
+                if file_units:
+                    logging.info(f"Found log: {full_log_path} ({file_units} units)")
+                    self.file_units[full_log_path] = file_units
+                    if self.metrics:
+                        self.metrics.start_file(full_log_path, None)
+        return units
+
+    # ---------- 服务端 ----------
+
+    def run(self, local_workers=0):
+        """分发所有工作单元，等待全部完成后保存按目录合并的结果，返回失败的单元列表"""
+        start_time = time.time()
+        asyncio.run(self.serve(local_workers))
+        self.save_all_results()
+        logging.info(f"Coordinator finished in {time.time() - start_time:.2f} seconds, "
+                     f"{len(self.failed_units)} failed units")
+        for save_dir, path in sorted({(unit.save_dir, unit.path) for unit in self.failed_units}):
+            logging.error(f"Report in {save_dir} is incomplete: part of {path} was not analyzed")
+        return self.failed_units
+
+    async def serve(self, local_workers=0):
+        self.queue = asyncio.Queue()
+        self.all_done = asyncio.Event()
+        units = self.plan_units()
+        for unit in units:
+            self.queue.put_nowait(unit)
+            self.outstanding[unit.unit_id] = unit
+        self.remaining = len(units)
+        if not units:
+            logging.warning(f"No evtx files found under {self.root_log_dir}")
+            return
+
+        server = await asyncio.start_server(self.handle_worker, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        logging.info(f"Coordinator listening on {self.host}:{self.port}, {len(units)} units")
+
+        processes = [self.start_local_worker(i) for i in range(local_workers)]
+        async with server:
+            await self.watch(processes)
+            server.close()
+            # 超时放弃时仍在处理单元的连接直接关闭
+            for writer in list(self.writers):
+                writer.close()
+            await server.wait_closed()
+
+        # 正常结束的 worker 收到 shutdown 后自行退出，其余的直接结束
+        loop = asyncio.get_running_loop()
+        for p in processes:
+            await loop.run_in_executor(None, p.join, 5)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+
+    def start_local_worker(self, index):
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        p = multiprocessing.Process(target=run_worker, args=(host, self.port, self.token, f"local-{index + 1}"))
+        p.daemon = True
+        p.start()
+        return p
+
+    async def watch(self, processes):
+        """
+        等待所有单元完成；期间重启退出的本机 worker，
+        没有可用的 worker 或超过总时限时把剩余单元记为失败
+        """
+        max_respawns = self.max_respawns
+        if max_respawns is None:
+            max_respawns = len(processes) * (self.max_retries + 1)
+        start_time = idle_since = time.time()
+
+        while not self.all_done.is_set():
+            try:
+                await asyncio.wait_for(self.all_done.wait(), 1)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            for i, p in enumerate(processes):
+                if not p.is_alive() and self.respawned_workers < max_respawns:
+                    self.respawned_workers += 1
+                    logging.warning(f"Local worker local-{i + 1} exited with code {p.exitcode}, restarting "
+                                    f"({self.respawned_workers}/{max_respawns})")
+                    processes[i] = self.start_local_worker(i)
+
+            now = time.time()
+            if self.deadline is not None and now - start_time > self.deadline:
+                self.abandon_units(f"deadline of {self.deadline} seconds exceeded")
+                return
+
+            local_alive = any(p.is_alive() for p in processes)
+            if self.writers or local_alive:
+                idle_since = now
+            elif processes:
+                # 本机 worker 已全部退出且不再重启
+                self.abandon_units("all local workers exited")
+                return
+            elif now - idle_since > self.worker_wait_timeout:
+                self.abandon_units(f"no worker connected for {self.worker_wait_timeout} seconds")
+                return
+
+    def abandon_units(self, reason):
+        units = list(self.outstanding.values())
+        logging.error(f"Giving up on {len(units)} remaining units: {reason}")
+        for unit in units:
+            self.unit_failed(unit)
+
+    async def handle_worker(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        name = str(peer)
+        try:
+            try:
+                # hello 不带 payload，在令牌校验之前按很小的上限读取
+                header, _ = await asyncio.wait_for(read_message(reader, HELLO_MAX_SIZE, max_payload_size=0), 30)
+            except ValueError as e:
+                logging.warning(f"Invalid hello from {peer}: {e}")
+                header = {}
+            if header.get('type') != 'hello' or not self.check_token(header.get('token')):
+                logging.warning(f"Rejected worker connection from {peer}")
+                self.rejected_workers += 1
+                await send_message(writer, {'type': 'rejected'})
+                return
+
+            name = header.get('name') or name
+            logging.info(f"Worker connected: {name} ({peer})")
+            self.writers.add(writer)
+            while True:
+                unit = await self.next_unit()
+                if unit is None:
+                    await send_message(writer, {'type': 'shutdown'})
+                    return
+                if not await self.run_unit(name, unit, reader, writer):
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            logging.warning(f"Worker {name} disconnected: {e!r}")
+        except Exception as e:
+            logging.error(f"Worker {name} error: {e}")
+            logging.error(traceback.format_exc())
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    def check_token(self, token):
+        if self.token is None:
+            return True
+        return isinstance(token, str) and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    async def next_unit(self):
+        """取下一个待处理单元，全部完成后返回 None；失败重试的单元会重新放回队列，因此不能只看队列是否为空"""
+        while not self.all_done.is_set():
+            try:
+                return await asyncio.wait_for(self.queue.get(), 1)
+            except asyncio.TimeoutError:
+                continue
+        return None
+
+    async def run_unit(self, name, unit, reader, writer):
+        """把单元发给 worker 并等待结果，返回连接是否仍可继续使用"""
+        unit.attempts += 1
+        try:
+            payload = await asyncio.get_running_loop().run_in_executor(None, unit.read)
+        except OSError as e:
+            logging.error(f"Failed to read {unit}: {e}")
+            self.unit_failed(unit)
+            return True
+
+        try:
+            await send_message(writer, {
+                'type': 'unit',
+                'unit_id': unit.unit_id,
+                'path': unit.path,
+                'target_event_ids': self.target_event_ids,
+            }, payload)
+            header, _ = await asyncio.wait_for(read_message(reader), self.unit_timeout)
+        except BaseException as e:
+            # 超时或断开后连接状态未知，重新分配该单元并关闭连接
+            self.retry_unit(unit, f"worker {name}: {e!r}")
+            if isinstance(e, Exception):
+                return False
+            raise
+
+        if header.get('type') == 'result' and header.get('unit_id') == unit.unit_id:
+            self.merge_unit(unit, header)
+        else:
+            self.retry_unit(unit, f"worker {name}: {header.get('error', header.get('type'))}")
+        return True
+
+    def retry_unit(self, unit, reason):
+        if unit.done:
+            # 已因超过时限等原因放弃
+            return
+        if unit.attempts <= self.max_retries:
+            logging.warning(f"{unit} failed ({reason}), retrying ({unit.attempts}/{self.max_retries})")
+            self.retried_units += 1
+            self.queue.put_nowait(unit)
+        else:
+            logging.error(f"{unit} failed ({reason}), giving up after {unit.attempts} attempts")
+            self.unit_failed(unit)
+
+    def unit_failed(self, unit):
+        if unit.done:
+            return
+        self.failed_units.append(unit)
+        self.unit_finished(unit)
+
+    def merge_unit(self, unit, header):
+        if unit.done:
+            return
+        handlers = self.handlers.get(unit.save_dir)
+        if handlers is None:
+            handlers = self.handlers[unit.save_dir] = create_handlers(self.target_event_ids)
+        for event_id, data in header.get('results', {}).items():
+            handler = handlers.get(int(event_id))
+            if handler is None:
+                continue
+            try:
+                handler.merge_result(data)
+            except Exception as e:
+                logging.error(f"Failed to merge results of {unit} for event {event_id}: {e}")
+                logging.error(traceback.format_exc())
+
+        if self.metrics:
+            stats = header.get('stats', {})
+            self.metrics.record_batch(unit.path, stats.get('scanned', 0), stats.get('enqueued', 0),
+                                      stats.get('deduplicated', 0))
+            for stage in ('handled', 'errored', 'read_errors'):
+                if stats.get(stage):
+                    self.metrics.add(stage, stats[stage])
+        self.unit_finished(unit)
+
+    def unit_finished(self, unit):
+        unit.done = True
+        self.outstanding.pop(unit.unit_id, None)
+        self.file_units[unit.path] -= 1
+        if self.file_units[unit.path] == 0 and self.metrics:
+            self.metrics.finish_file(unit.path)
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.all_done.set()
+
+    def save_all_results(self):
+        for save_dir, handlers in self.handlers.items():
+            os.makedirs(save_dir, exist_ok=True)
+            logging.info(f"Saving analysis to: {save_dir}")
+            for handler in handlers.values():
+                try:
+                    handler.save_analyze_result(save_dir)
+                except Exception as e:
+                    logging.error(f"Error saving results for handler {handler}: {e}")
+
+
+class AnalysisWorker:
+    def __init__(self, host, port, token=None, name=None, num_workers=2, connect_retries=30):
+        """
+        :param host: 协调节点地址
+        :param port: 协调节点端口
+        :param token: 协调节点要求的共享令牌
+        :param name: worker 名称，默认 主机名-进程号
+        :param num_workers: 分析单元时的处理线程数
+        :param connect_retries: 协调节点尚未启动或连接断开后的连接重试次数（每秒一次）
+        """
+        self.host = host
+        self.port = port
+        self.token = token
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.num_workers = num_workers
+        self.connect_retries = connect_retries
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def connect(self):
+        for attempt in range(self.connect_retries + 1):
+            try:
+                return await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                if attempt == self.connect_retries:
+                    raise
+                logging.info(f"Worker {self.name}: coordinator not reachable ({e}), retrying...")
+                await asyncio.sleep(1)
+
+    async def serve(self):
+        """连接协调节点并处理单元，连接断开后重连，收到 shutdown 或被拒绝后退出"""
+        units = 0
+        try:
+            while True:
+                reader, writer = await self.connect()
+                try:
+                    finished, analyzed = await self.session(reader, writer)
+                finally:
+                    writer.close()
+                units += analyzed
+                if finished:
+                    return
+                logging.warning(f"Worker {self.name}: connection to coordinator lost, reconnecting")
+        except OSError as e:
+            logging.error(f"Worker {self.name}: cannot reach coordinator: {e}")
+        finally:
+            logging.info(f"Worker {self.name} finished, {units} units analyzed")
+
+    async def session(self, reader, writer):
+        """处理一个连接，返回 (是否正常结束, 分析的单元数)"""
+        loop = asyncio.get_running_loop()
+        units = 0
+        try:
+            await send_message(writer, {'type': 'hello', 'name': self.name, 'token': self.token})
+            while True:
+                header, payload = await read_message(reader)
+                message_type = header.get('type')
+                if message_type == 'rejected':
+                    logging.error(f"Worker {self.name}: rejected by coordinator (check the token)")
+                    return True, units
+                if message_type == 'shutdown':
+                    return True, units
+                if message_type != 'unit':
+                    logging.warning(f"Worker {self.name}: unknown message type {message_type}")
+                    continue
+
+                try:
+                    results, stats = await loop.run_in_executor(None, self.analyze_unit, header, payload)
+                    reply = {'type': 'result', 'unit_id': header['unit_id'], 'results': results, 'stats': stats}
+                    units += 1
+                except Exception as e:
+                    logging.error(f"Worker {self.name}: failed to analyze unit {header.get('unit_id')}: {e}")
+                    logging.error(traceback.format_exc())
+                    reply = {'type': 'error', 'unit_id': header.get('unit_id'), 'error': str(e)}
+                try:
+                    await send_message(writer, reply)
+                except ValueError as e:
+                    logging.error(f"Worker {self.name}: failed to send result of unit {header.get('unit_id')}: {e}")
+                    await send_message(writer, {'type': 'error', 'unit_id': header.get('unit_id'), 'error': str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return False, units
+
+    def analyze_unit(self, header, payload):
+        """分析一个单元的 chunk 数据，返回 ({事件ID: 部分结果}, 计数)"""
+        target_event_ids = header['target_event_ids']
+        handlers = create_handlers(target_event_ids)
+        metrics = PipelineMetrics()
+        analyzer = EventLogAnalyzer(header['path'], '', metrics=metrics, backend='python')
+        register_handlers(analyzer, target_event_ids, handlers)
+
+        chunks = (payload[ofs:ofs + CHUNK_SIZE] for ofs in range(0, len(payload) - CHUNK_SIZE + 1, CHUNK_SIZE)
+                  if payload[ofs:ofs + 8] == CHUNK_MAGIC)
+        analyzer.run(num_workers=self.num_workers, chunks=chunks, save_results=False)
+
+        results = {str(event_id): handler.export_result() for event_id, handler in handlers.items()}
+        return results, metrics.snapshot()['counters']
+
+
+def run_worker(host, port, token=None, name=None):
+    """worker 进程入口（需为模块级函数，Windows 下 multiprocessing 使用 spawn）"""
+    try:
+        AnalysisWorker(host, port, token=token, name=name).run()
+    except Exception as e:
+        logging.error(f"Worker {name} error: {e}")
+        logging.error(traceback.format_exc())
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or "127.0.0.1", int(port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distribute EVTX analysis across worker processes")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator")
+    coordinator_parser.add_argument("root_log_dir")
+    coordinator_parser.add_argument("analysis_root_dir")
+    coordinator_parser.add_argument("--events", type=int, nargs='+', default=[4625])
+    coordinator_parser.add_argument("--need", nargs='+', default=None, help="only analyze these file names")
+    coordinator_parser.add_argument("--host", default="127.0.0.1")
+    coordinator_parser.add_argument("--port", type=int, default=9100)
+    coordinator_parser.add_argument("--token", default=None)
+    coordinator_parser.add_argument("--chunks-per-unit", type=int, default=256)
+    coordinator_parser.add_argument("--max-retries", type=int, default=3)
+    coordinator_parser.add_argument("--unit-timeout", type=float, default=600)
+    coordinator_parser.add_argument("--local-workers", type=int, default=0)
+    coordinator_parser.add_argument("--worker-wait-timeout", type=float, default=300)
+    coordinator_parser.add_argument("--deadline", type=float, default=None)
+
+    worker_parser = subparsers.add_parser("worker")
+    worker_parser.add_argument("address", help="coordinator host:port")
+    worker_parser.add_argument("--token", default=None)
+    worker_parser.add_argument("--name", default=None)
+    worker_parser.add_argument("--threads", type=int, default=2)
+
+    args = parser.parse_args()
+    if args.role == "coordinator":
+        coordinator = Coordinator(
+            args.root_log_dir, args.analysis_root_dir, target_event_ids=args.events, need_result=args.need,
+            host=args.host, port=args.port, token=args.token, chunks_per_unit=args.chunks_per_unit,
+            max_retries=args.max_retries, unit_timeout=args.unit_timeout,
+            worker_wait_timeout=args.worker_wait_timeout, deadline=args.deadline,
+        )
+        failed = coordinator.run(local_workers=args.local_workers)
+        sys.exit(1 if failed else 0)
+    else:
+        host, port = parse_address(args.address)
+        AnalysisWorker(host, port, token=args.token, name=args.name, num_workers=args.threads).run()
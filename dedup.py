@@ -0,0 +1,125 @@
+"""
+dedup.py
+
+RecordDeduplicator 类用于跨文件的事件记录去重，键为 (计算机名, 通道, EventRecordID)。
+
+功能说明：
+- 同一主机被多次采集时，不同目录下会有相互重叠的 Security.evtx 副本，合并分析时同一条记录只应计数一次。
+- 内存中使用布隆过滤器做快速判断：未命中则一定是新记录，只有命中时才查询精确集合。
+- 精确集合先保存在内存中，超过 spill_threshold 后批量写入磁盘上的 SQLite 临时库，内存占用有上限。
+- 线程安全，可被多个读取线程同时调用。
+
+使用示例：
+    with RecordDeduplicator(expected_records=50000000) as dedup:
+        if not dedup.is_duplicate(computer, channel, record_id):
+            handler.handle(event)
+
+作者：
+日期：
+"""
+
+import os
+import math
+import sqlite3
+import logging
+import tempfile
+import threading
+
+
+class BloomFilter:
+    def __init__(self, expected_items, false_positive_rate):
+        expected_items = max(expected_items, 1)
+        self.size = max(int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / expected_items * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # 双重哈希：第 i 个位置为 h1 + i * h2
+        h1 = hash(key)
+        h2 = hash((key, 0x9E3779B9)) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def add(self, key):
+        """加入 key，返回加入前 key 是否可能已存在"""
+        bits = self.bits
+        present = True
+        for pos in self._positions(key):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        return present
+
+
+class RecordDeduplicator:
+    def __init__(self, expected_records=10000000, false_positive_rate=0.001, spill_threshold=200000,
+                 spill_dir=None):
+        """
+        :param expected_records: 预计的记录总数，用于确定布隆过滤器大小
+        :param false_positive_rate: 布隆过滤器的误判率
+        :param spill_threshold: 内存中的精确集合超过该数量后写入磁盘
+        :param spill_dir: SQLite 临时库所在目录，默认系统临时目录
+        """
+        self.bloom = BloomFilter(expected_records, false_positive_rate)
+        self.spill_threshold = spill_threshold
+        self.lock = threading.Lock()
+        self.sources = {}  # {(计算机名, 通道): 编号}，键中用编号代替字符串以节省内存
+        self.pending = set()
+        self.duplicates = 0
+        self.bloom_hits = 0
+
+        fd, self.db_path = tempfile.mkstemp(prefix="evtx_dedup_", suffix=".sqlite", dir=spill_dir)
+        os.close(fd)
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=OFF")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute("CREATE TABLE seen (source INTEGER, record_id INTEGER, PRIMARY KEY (source, record_id))"
+                        " WITHOUT ROWID")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def is_duplicate(self, computer, channel, record_id):
+        """判断记录是否已出现过，未出现过则记录下来"""
+        source_key = (computer.lower(), channel.lower())
+        with self.lock:
+            source = self.sources.get(source_key)
+            if source is None:
+                source = self.sources[source_key] = len(self.sources)
+            key = (source, record_id)
+
+            if self.bloom.add(key):
+                self.bloom_hits += 1
+                if key in self.pending or self._spilled(key):
+                    self.duplicates += 1
+                    return True
+
+            self.pending.add(key)
+            if len(self.pending) >= self.spill_threshold:
+                self._spill()
+            return False
+
+    def _spilled(self, key):
+        return self.db.execute("SELECT 1 FROM seen WHERE source = ? AND record_id = ?", key).fetchone() is not None
+
+    def _spill(self):
+        self.db.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?)", self.pending)
+        self.db.commit()
+        self.pending.clear()
+
+    def close(self):
+        with self.lock:
+            if self.db is None:
+                return
+            self.db.close()
+            self.db = None
+            try:
+                os.remove(self.db_path)
+            except OSError as e:
+                logging.warning(f"Failed to remove dedup spill file {self.db_path}: {e}")
+        logging.info(f"Deduplicator: {self.duplicates} duplicate records skipped, "
+                     f"{self.bloom_hits} bloom filter hits")
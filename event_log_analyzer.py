@@ -1,10 +1,17 @@
 import os
 import threading
 import queue
-import win32evtlog
-import winerror
 import time
 import logging
+from evtx_reader import EvtxFileReader, EvtxChunk
+
+try:
+    import win32evtlog
+    import winerror
+except ImportError:
+    # 非 Windows 环境没有 pywin32，只能使用纯 Python 的 evtx_reader 后端
+    win32evtlog = None
+    winerror = None
 from handle import (
     Event4625Handler,
     Event18456Handler,
@@ -20,7 +27,13 @@ logging.basicConfig(
 )
 
 class EventLogAnalyzer:
-    def __init__(self, evtx_path, save_log_dir, max_queue_size=1000):
+    def __init__(self, evtx_path, save_log_dir, max_queue_size=1000, metrics=None, backend=None,
+                 deduplicator=None):
+        """
+        :param backend: 'win32' 使用 win32evtlog 读取，'python' 使用纯 Python 的 evtx_reader，
+                        None 表示有 pywin32 时用 'win32'，否则用 'python'
+        :param deduplicator: 可选的 RecordDeduplicator，多个分析器共用时同一条记录只处理一次
+        """
         self.handlers = {}  # {event_id: handler}
         self.queue = queue.Queue(maxsize=max_queue_size)
         self.evtx_path = evtx_path
@@ -28,6 +41,12 @@ class EventLogAnalyzer:
         self.worker_threads = []
         self.feed_threads = []
         self.stop_event = threading.Event()
+        self.metrics = metrics  # 可选的 PipelineMetrics，None 表示不采集指标
+        self.backend = backend or ('win32' if win32evtlog is not None else 'python')
+        self.deduplicator = deduplicator
+        self.channel = None  # win32 后端去重时使用的通道名，见 get_log_channel
+        self.lock = threading.Lock()
+        self.read_errors = 0  # 读取失败而跳过的记录、chunk 或范围数
 
     def register_handler(self, event_id, handler):
         """注册事件ID对应的处理器"""
@@ -36,6 +55,9 @@ class EventLogAnalyzer:
     def get_log_info(self):
         """获取日志文件的最早记录号和总记录数"""
         try:
+            if self.backend == 'python':
+                with EvtxFileReader(self.evtx_path) as reader:
+                    return reader.get_log_info()
             h = win32evtlog.OpenBackupEventLog(None, self.evtx_path)
             oldest = win32evtlog.GetOldestEventLogRecord(h)
             total = win32evtlog.GetNumberOfEventLogRecords(h)
@@ -47,6 +69,9 @@ class EventLogAnalyzer:
 
     def read_range(self, start, end):
         """读取指定范围内的事件日志，并放入队列"""
+        if self.backend == 'python':
+            self.read_range_python(start, end)
+            return
         try:
             h = win32evtlog.OpenBackupEventLog(None, self.evtx_path)
             flags = win32evtlog.EVENTLOG_FORWARDS_READ | win32evtlog.EVENTLOG_SEEK_READ
@@ -55,20 +80,124 @@ class EventLogAnalyzer:
                 events = win32evtlog.ReadEventLog(h, flags, offset)
                 if not events:
                     break
+                scanned = enqueued = duplicates = 0
                 for evt in events:
                     rec_num = evt.RecordNumber
                     if rec_num > end:
-                        win32evtlog.CloseEventLog(h)
-                        return
+                        break
+                    scanned += 1
                     event_id = winerror.HRESULT_CODE(evt.EventID)
                     if event_id in self.handlers:
-                        # 队列满时阻塞，防止内存暴涨
-                        self.queue.put({'event_id': event_id, 'event': evt})
+                        if self.deduplicator and self.deduplicator.is_duplicate(evt.ComputerName, self.channel,
+                                                                                rec_num):
+                            duplicates += 1
+                            continue
+                        enqueued += 1
+                        self.put_event(event_id, evt)
+                if self.metrics:
+                    self.metrics.record_batch(self.evtx_path, scanned, enqueued, duplicates)
+                if scanned < len(events):
+                    break
                 offset = events[-1].RecordNumber + 1 if events else offset + 1
             win32evtlog.CloseEventLog(h)
         except Exception as e:
+            self.add_read_errors()
+            logging.error(f"Failed to read range {start}-{end}: {e}")
+
+    def read_range_python(self, start, end):
+        """纯 Python 后端：按 chunk 读取记录号在 [start, end] 内的记录"""
+        try:
+            with EvtxFileReader(self.evtx_path) as reader:
+                for chunk in reader.iter_chunks(start, end):
+                    if self.stop_event.is_set():
+                        break
+                    self.read_chunk(chunk, start, end)
+        except Exception as e:
+            self.add_read_errors()
             logging.error(f"Failed to read range {start}-{end}: {e}")
 
+    def read_chunk_stream(self, chunks):
+        """纯 Python 后端：从 chunk 缓冲区流（如压缩包中的成员）顺序读取记录，并放入队列"""
+        plans = {}
+        try:
+            for chunk_buf in chunks:
+                if self.stop_event.is_set():
+                    break
+                try:
+                    chunk = EvtxChunk(chunk_buf, 0, plans)
+                    if chunk.record_count() > 0:
+                        self.read_chunk(chunk)
+                except Exception as e:
+                    # 单个 chunk 损坏（如恢复出来的 chunk）时跳过，继续读取后面的 chunk
+                    self.add_read_errors()
+                    logging.error(f"Failed to read chunk in {self.evtx_path}: {e}")
+        except Exception as e:
+            self.add_read_errors()
+            logging.error(f"Failed to read chunk stream {self.evtx_path}: {e}")
+
+    def read_chunk(self, chunk, start=None, end=None):
+        """
+        读取单个 chunk 中记录号在 [start, end] 内的记录，先按事件ID过滤再完整解析。
+        单条记录损坏（BinXML 无法解析等）时只跳过该记录并计入 read_errors，继续读取后面的记录
+        """
+        scanned = enqueued = duplicates = errors = 0
+        try:
+            for offset in chunk.record_offsets(start, end):
+                scanned += 1
+                try:
+                    event_id = chunk.event_id(offset)
+                    if event_id not in self.handlers:
+                        continue
+                    if self.deduplicator:
+                        computer, channel = chunk.record_source(offset)
+                        if self.deduplicator.is_duplicate(computer, channel, chunk.record_number(offset)):
+                            duplicates += 1
+                            continue
+                    event = chunk.parse_record(offset)
+                except Exception as e:
+                    errors += 1
+                    logging.error(f"Failed to read record at chunk offset {offset:#x} in {self.evtx_path}: {e}")
+                    continue
+                enqueued += 1
+                self.put_event(event_id, event)
+        finally:
+            if errors:
+                with self.lock:
+                    self.read_errors += errors
+            if self.metrics:
+                self.metrics.record_batch(self.evtx_path, scanned, enqueued, duplicates, errors)
+
+    def add_read_errors(self, n=1):
+        """记录读取失败（单条记录、整个 chunk 或整个范围），不采集指标时也保留在 read_errors 中"""
+        with self.lock:
+            self.read_errors += n
+        if self.metrics:
+            self.metrics.add('read_errors', n)
+
+    def put_event(self, event_id, event):
+        """把事件放入队列，队列满时阻塞，防止内存暴涨"""
+        if not self.metrics:
+            self.queue.put({'event_id': event_id, 'event': event})
+            return
+        # enqueue_time 从开始 put 算起，队列等待时间因此包含 put 阻塞的时间
+        start = time.perf_counter()
+        self.queue.put({'event_id': event_id, 'event': event, 'enqueue_time': start})
+        self.metrics.observe_put_block(time.perf_counter() - start)
+
+    def get_log_channel(self):
+        """
+        win32 后端去重用的通道名：pywin32 的记录不带通道，一个 evtx 文件只属于一个通道，
+        因此用纯 Python 后端读取第一条记录的通道，读取失败时退回到小写的文件名
+        """
+        try:
+            with EvtxFileReader(self.evtx_path) as reader:
+                for chunk in reader.iter_chunks():
+                    for offset in chunk.record_offsets():
+                        return chunk.record_source(offset)[1]
+        except Exception as e:
+            logging.warning(f"Failed to read channel of {self.evtx_path}: {e}")
+        return os.path.basename(self.evtx_path).lower()
+
     def feed_log_file_multithread(self, num_producers=4):
         """启动多个线程读取日志文件"""
         try:
@@ -76,10 +205,15 @@ class EventLogAnalyzer:
         except Exception:
             return
 
+        if self.deduplicator and self.backend == 'win32':
+            self.channel = self.get_log_channel()
+
         last = first + total - 1
         step = total // num_producers if num_producers > 0 else total
 
         logging.info(f"First record: {first}, Last record: {last}, Total: {total}")
+        if self.metrics:
+            self.metrics.start_file(self.evtx_path, total)
 
         for i in range(num_producers):
             start = first + i * step
@@ -90,6 +224,17 @@ class EventLogAnalyzer:
             t.start()
             logging.info(f"Producer-{i + 1} reading records {start} to {end}")
 
+    def feed_chunk_stream(self, chunks):
+        """启动一个线程从 chunk 流读取，chunk 流只能顺序读取一遍，因此只用一个生产者"""
+        logging.info(f"Streaming chunks from {self.evtx_path}")
+        if self.metrics:
+            self.metrics.start_file(self.evtx_path, None)
+
+        t = threading.Thread(target=self.read_chunk_stream, args=(chunks,), name="Producer-1")
+        t.daemon = True
+        self.feed_threads.append(t)
+        t.start()
+
     def worker(self):
         """消费者线程，从队列中取事件并调用对应处理器"""
         while not self.stop_event.is_set():
@@ -106,9 +251,14 @@ class EventLogAnalyzer:
                 event_id = item.get('event_id')
                 event = item.get('event')
                 handler = self.handlers.get(event_id)
-                if handler:
+                if handler and self.metrics:
+                    self.metrics.observe_queue_wait(time.perf_counter() - item['enqueue_time'])
+                    self.metrics.call_handler(event_id, handler, event)
+                elif handler:
                     handler.handle(event)
             except Exception as e:
+                if self.metrics:
+                    self.metrics.add('errored')
                 logging.error(f"Worker error processing event {event_id}: {e}")
             finally:
                 self.queue.task_done()
@@ -133,9 +283,16 @@ class EventLogAnalyzer:
         for t in self.worker_threads:
             t.join()
 
-    def run(self, num_producers=4, num_workers=2):
-        """启动日志分析流程"""
-        self.feed_log_file_multithread(num_producers=num_producers)
+    def run(self, num_producers=4, num_workers=2, chunks=None, save_results=True):
+        """
+        启动日志分析流程
+        :param chunks: chunk 缓冲区的可迭代对象（如压缩包成员），不为 None 时从中读取而不是打开 evtx_path
+        :param save_results: 是否在结束时保存结果；多个文件共用处理器合并分析时由调用方统一保存
+        """
+        if chunks is None:
+            self.feed_log_file_multithread(num_producers=num_producers)
+        else:
+            self.feed_chunk_stream(chunks)
         self.worker_log_file_multithread(num_workers=num_workers)
 
         # 等待所有生产者线程结束
@@ -147,7 +304,11 @@ class EventLogAnalyzer:
 
         self.stop_all()
 
-        self.save_all_results(self.save_log_dir)
+        if self.metrics:
+            self.metrics.finish_file(self.evtx_path)
+
+        if save_results:
+            self.save_all_results(self.save_log_dir)
 
     def save_all_results(self, output_dir):
         """保存所有处理器的分析结果"""
@@ -157,6 +318,8 @@ class EventLogAnalyzer:
                 handler.save_analyze_result(output_dir)
             except Exception as e:
                 logging.error(f"Error saving results for handler {handler}: {e}")
+        if self.metrics:
+            self.metrics.dump_profiles(output_dir)
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -0,0 +1,471 @@
+"""
+evtx_generator.py
+
+合成 evtx 日志生成器，在任意平台（包括 Linux）上写出结构合法的 .evtx 文件，用作测试数据和性能基准。
+
+功能说明：
+- 按 evtx 格式写出文件头、chunk 头（含字符串表、模板表和 CRC32 校验）以及 BinXml 编码的事件记录。
+- 每种事件ID对应一个模板，模板在每个 chunk 中首次使用时内联定义，之后按偏移引用，与系统生成的文件结构一致。
+- 可配置记录数、事件ID比例（4625/18456/4688/5156/7045）、IP/用户/进程的基数、计算机名和起始记录号。
+- 可配置 chunk 布局：chunk 填充比例、每个 chunk 最多记录数、文件末尾预分配的空 chunk 数。
+
+使用示例：
+    generate_evtx("Security.evtx", 100000, event_mix={4625: 0.7, 4688: 0.3}, ip_count=500)
+
+    python evtx_generator.py out.evtx --records 100000 --mix 4625=0.7,4688=0.3 --ips 500
+
+作者：
+日期：
+"""
+
+import zlib
+import uuid
+import random
+import struct
+import logging
+import argparse
+import datetime
+
+from evtx_reader import (
+    FILE_MAGIC,
+    CHUNK_MAGIC,
+    RECORD_MAGIC,
+    FILE_HEADER_SIZE,
+    CHUNK_SIZE,
+    CHUNK_HEADER_SIZE,
+    TYPE_UINT16,
+    TYPE_FILETIME,
+)
+
+TYPE_WSTRING = 0x01
+TYPE_UINT64 = 0x0A
+
+MAX_CHUNKS_PER_FILE = 0xFFFF
+FILETIME_EPOCH = datetime.datetime(1601, 1, 1, tzinfo=datetime.timezone.utc)
+EVENT_NS = "http://schemas.microsoft.com/win/2004/08/events/event"
+
+DEFAULT_EVENT_MIX = {4625: 0.4, 4688: 0.25, 5156: 0.25, 7045: 0.05, 18456: 0.05}
+
+# {事件ID: (Provider, Channel, EventData 中 Data 的 Name 列表，None 表示经典事件的无名 Data)}
+EVENT_SCHEMAS = {
+    4625: ("Microsoft-Windows-Security-Auditing", "Security", [
+        "SubjectUserSid", "SubjectUserName", "SubjectDomainName", "SubjectLogonId", "TargetUserSid",
+        "TargetUserName", "TargetDomainName", "Status", "FailureReason", "SubStatus", "LogonType",
+        "LogonProcessName", "AuthenticationPackageName", "WorkstationName", "TransmittedServices",
+        "LmPackageName", "KeyLength", "ProcessId", "ProcessName", "IpAddress", "IpPort",
+    ]),
+    4688: ("Microsoft-Windows-Security-Auditing", "Security", [
+        "SubjectUserSid", "SubjectUserName", "SubjectDomainName", "SubjectLogonId", "NewProcessId",
+        "NewProcessName", "TokenElevationType", "ProcessId", "CommandLine", "TargetUserSid",
+        "TargetUserName", "TargetDomainName", "TargetLogonId", "ParentProcessName", "MandatoryLabel",
+    ]),
+    5156: ("Microsoft-Windows-Security-Auditing", "Security", [
+        "ProcessID", "Application", "Direction", "SourceAddress", "SourcePort", "DestAddress",
+        "DestPort", "Protocol", "FilterRTID", "LayerName", "LayerRTID", "RemoteUserID", "RemoteMachineID",
+    ]),
+    7045: ("Service Control Manager", "System", [
+        "ServiceName", "ImagePath", "ServiceType", "StartType", "AccountName",
+    ]),
+    18456: ("MSSQLSERVER", "Application", [None, None, None]),
+}
+
+# 模板中 System 部分的替换值下标，EventData 的替换值从 DATA_SUB_BASE 开始
+SUB_PROVIDER, SUB_EVENT_ID, SUB_TIME, SUB_RECORD_ID, SUB_CHANNEL, SUB_COMPUTER = range(6)
+DATA_SUB_BASE = 6
+
+
+class Sub:
+    """模板中的替换值占位"""
+    __slots__ = ('index', 'type')
+
+    def __init__(self, index, type_):
+        self.index = index
+        self.type = type_
+
+
+def name_hash(name):
+    """evtx 字符串表使用的名称哈希（UTF-16 字符逐个乘 65599 累加，取低16位）"""
+    value = 0
+    for ch in name:
+        value = (value * 65599 + ord(ch)) & 0xFFFFFFFF
+    return value & 0xFFFF
+
+
+def event_template(event_id):
+    """返回事件ID对应的模板元素树：(名称, [(属性名, 值)], [子节点])"""
+    _, _, data_names = EVENT_SCHEMAS[event_id]
+    data = []
+    for i, data_name in enumerate(data_names):
+        attrs = [("Name", data_name)] if data_name else []
+        data.append(("Data", attrs, [Sub(DATA_SUB_BASE + i, TYPE_WSTRING)]))
+
+    system = ("System", [], [
+        ("Provider", [("Name", Sub(SUB_PROVIDER, TYPE_WSTRING))], []),
+        ("EventID", [], [Sub(SUB_EVENT_ID, TYPE_UINT16)]),
+        ("TimeCreated", [("SystemTime", Sub(SUB_TIME, TYPE_FILETIME))], []),
+        ("EventRecordID", [], [Sub(SUB_RECORD_ID, TYPE_UINT64)]),
+        ("Channel", [], [Sub(SUB_CHANNEL, TYPE_WSTRING)]),
+        ("Computer", [], [Sub(SUB_COMPUTER, TYPE_WSTRING)]),
+    ])
+    return ("Event", [("xmlns", EVENT_NS)], [system, ("EventData", [], data)])
+
+
+class _ChunkBuilder:
+    """在内存中构建单个 chunk"""
+
+    def __init__(self, usable_size, max_records):
+        self.data = bytearray(CHUNK_SIZE)
+        self.pos = CHUNK_HEADER_SIZE
+        self.limit = CHUNK_HEADER_SIZE + usable_size
+        self.max_records = max_records
+        self.names = {}  # {名称: chunk 内偏移}
+        self.string_buckets = [0] * 64
+        self.templates = {}  # {事件ID: chunk 内偏移}
+        self.template_buckets = [0] * 32
+        self.first_id = None
+        self.last_id = None
+        self.last_record_offset = 0
+        self.count = 0
+
+    # ---------- BinXml 模板编码 ----------
+
+    def _name(self, name, pos, pending, buckets):
+        """编码名称引用，pos 为偏移字段所在位置；名称首次出现时内联定义在偏移字段之后"""
+        offset = self.names.get(name, pending.get(name))
+        if offset is not None:
+            return struct.pack('<I', offset)
+        offset = pos + 4
+        hash_value = name_hash(name)
+        bucket = hash_value % 64
+        encoded = name.encode('utf-16-le')
+        out = struct.pack('<IIHH', offset, buckets[bucket], hash_value, len(name)) + encoded + b'\x00\x00'
+        buckets[bucket] = offset
+        pending[name] = offset
+        return out
+
+    def _value(self, value):
+        if isinstance(value, Sub):
+            return struct.pack('<BHB', 0x0D, value.index, value.type)
+        return struct.pack('<BBH', 0x05, TYPE_WSTRING, len(value)) + value.encode('utf-16-le')
+
+    def _element(self, element, pos, pending, buckets):
+        name, attrs, children = element
+        out = bytearray()
+        out += struct.pack('<BHI', 0x41 if attrs else 0x01, 0xFFFF, 0)
+        out += self._name(name, pos + len(out), pending, buckets)
+
+        if attrs:
+            attr_size_at = len(out)
+            out += b'\x00\x00\x00\x00'
+            attr_start = len(out)
+            for i, (attr_name, attr_value) in enumerate(attrs):
+                out.append(0x46 if i < len(attrs) - 1 else 0x06)
+                out += self._name(attr_name, pos + len(out), pending, buckets)
+                out += self._value(attr_value)
+            struct.pack_into('<I', out, attr_size_at, len(out) - attr_start)
+
+        if children:
+            out.append(0x02)
+            for child in children:
+                if isinstance(child, tuple):
+                    out += self._element(child, pos + len(out), pending, buckets)
+                else:
+                    out += self._value(child)
+            out.append(0x04)
+        else:
+            out.append(0x03)
+
+        struct.pack_into('<I', out, 3, len(out) - 7)
+        return bytes(out)
+
+    def _template_definition(self, event_id, pos):
+        """返回 (模板定义字节, 新定义的名称, 更新后的字符串表, GUID)，pos 为模板定义在 chunk 内的偏移"""
+        pending = {}
+        buckets = list(self.string_buckets)
+        body = bytes([0x0F, 0x01, 0x01, 0x00])
+        body += self._element(event_template(event_id), pos + 0x18 + len(body), pending, buckets)
+        body += b'\x00'
+        guid = uuid.uuid5(uuid.NAMESPACE_URL, f"evtx-generator/{event_id}").bytes_le
+        return struct.pack('<I', 0) + guid + struct.pack('<I', len(body)) + body, pending, buckets, guid
+
+    # ---------- 记录 ----------
+
+    def add_record(self, record_id, filetime, event_id, sub_values):
+        """尝试写入一条记录，chunk 空间不足时返回 False"""
+        if self.max_records and self.count >= self.max_records:
+            return False
+
+        pos = self.pos
+        instance_pos = pos + 0x18 + 4
+        template_offset = self.templates.get(event_id)
+        definition = b''
+        if template_offset is None:
+            template_offset = instance_pos + 10
+            definition, pending, buckets, guid = self._template_definition(event_id, template_offset)
+            template_id = struct.unpack_from('<I', guid)[0]
+        else:
+            template_id = struct.unpack_from('<I', self.data, template_offset + 4)[0]
+
+        descriptors = bytearray(struct.pack('<I', len(sub_values)))
+        for type_, value in sub_values:
+            descriptors += struct.pack('<HBB', len(value), type_, 0)
+
+        body = bytearray(struct.pack('<IIQQ', RECORD_MAGIC, 0, record_id, filetime))
+        body += bytes([0x0F, 0x01, 0x01, 0x00])
+        body += struct.pack('<BBII', 0x0C, 0x01, template_id, template_offset)
+        body += definition
+        body += descriptors
+        for _, value in sub_values:
+            body += value
+        body += b'\x00' * (-(len(body) + 4) % 8)
+        size = len(body) + 4
+        struct.pack_into('<I', body, 4, size)
+        body += struct.pack('<I', size)
+
+        if pos + size > self.limit:
+            return False
+
+        if definition:
+            self.names.update(pending)
+            self.string_buckets = buckets
+            self.templates[event_id] = template_offset
+            bucket = template_id % 32
+            struct.pack_into('<I', body, (template_offset - pos), self.template_buckets[bucket])
+            self.template_buckets[bucket] = template_offset
+
+        self.data[pos:pos + size] = body
+        self.last_record_offset = pos
+        self.pos += size
+        self.count += 1
+        if self.first_id is None:
+            self.first_id = record_id
+        self.last_id = record_id
+        return True
+
+    def finish(self):
+        """填写 chunk 头并返回完整的 64KB chunk"""
+        data = self.data
+        data[0:8] = CHUNK_MAGIC
+        struct.pack_into('<QQQQIIII', data, 8,
+                         self.first_id, self.last_id, self.first_id, self.last_id,
+                         0x80, self.last_record_offset, self.pos,
+                         zlib.crc32(data[CHUNK_HEADER_SIZE:self.pos]))
+        for i, offset in enumerate(self.string_buckets):
+            struct.pack_into('<I', data, 0x80 + i * 4, offset)
+        for i, offset in enumerate(self.template_buckets):
+            struct.pack_into('<I', data, 0x180 + i * 4, offset)
+        checksum = zlib.crc32(data[0:0x78])
+        checksum = zlib.crc32(data[0x80:CHUNK_HEADER_SIZE], checksum)
+        struct.pack_into('<I', data, 0x7C, checksum)
+        return bytes(data)
+
+
+class EvtxWriter:
+    def __init__(self, path, chunk_fill=1.0, max_records_per_chunk=None, trailing_empty_chunks=0):
+        """
+        :param path: 输出文件路径
+        :param chunk_fill: 每个 chunk 可用空间的填充比例 (0, 1]
+        :param max_records_per_chunk: 每个 chunk 最多写入的记录数，None 表示不限制
+        :param trailing_empty_chunks: 文件末尾追加的全零预分配 chunk 数
+        """
+        if not 0 < chunk_fill <= 1:
+            raise ValueError("chunk_fill must be in (0, 1]")
+        self.path = path
+        self.usable_size = int((CHUNK_SIZE - CHUNK_HEADER_SIZE) * chunk_fill)
+        self.max_records_per_chunk = max_records_per_chunk
+        self.trailing_empty_chunks = trailing_empty_chunks
+        self.file = open(path, 'wb')
+        self.file.write(b'\x00' * FILE_HEADER_SIZE)
+        self.chunk = None
+        self.chunk_count = 0
+        self.next_record_id = 1
+        self._wstring_cache = {}
+
+    def _wstring(self, value):
+        encoded = self._wstring_cache.get(value)
+        if encoded is None:
+            encoded = (value + '\x00').encode('utf-16-le')
+            if len(self._wstring_cache) < 100000:
+                self._wstring_cache[value] = encoded
+        return encoded
+
+    def write(self, record_id, time_created, event_id, computer, data_values):
+        """
+        写入一条记录
+        :param time_created: 带时区的 datetime
+        :param data_values: EventData 中各 Data 的字符串值，与 EVENT_SCHEMAS 中的顺序一致
+        """
+        provider, channel, _ = EVENT_SCHEMAS[event_id]
+        delta = time_created - FILETIME_EPOCH
+        filetime = ((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds) * 10
+        sub_values = [
+            (TYPE_WSTRING, self._wstring(provider)),
+            (TYPE_UINT16, struct.pack('<H', event_id)),
+            (TYPE_FILETIME, struct.pack('<Q', filetime)),
+            (TYPE_UINT64, struct.pack('<Q', record_id)),
+            (TYPE_WSTRING, self._wstring(channel)),
+            (TYPE_WSTRING, self._wstring(computer)),
+        ]
+        sub_values.extend((TYPE_WSTRING, self._wstring(value)) for value in data_values)
+
+        if self.chunk is not None and self.chunk.add_record(record_id, filetime, event_id, sub_values):
+            self.next_record_id = record_id + 1
+            return
+        if self.chunk is not None:
+            self._flush_chunk()
+        self.chunk = _ChunkBuilder(self.usable_size, self.max_records_per_chunk)
+        if not self.chunk.add_record(record_id, filetime, event_id, sub_values):
+            raise ValueError(f"Record {record_id} does not fit into an empty chunk")
+        self.next_record_id = record_id + 1
+
+    def _flush_chunk(self):
+        if self.chunk_count >= MAX_CHUNKS_PER_FILE:
+            raise ValueError(f"An evtx file cannot hold more than {MAX_CHUNKS_PER_FILE} chunks")
+        self.file.write(self.chunk.finish())
+        self.chunk_count += 1
+        self.chunk = None
+
+    def close(self):
+        if self.chunk is not None:
+            self._flush_chunk()
+        for _ in range(self.trailing_empty_chunks):
+            self.file.write(b'\x00' * CHUNK_SIZE)
+
+        header = bytearray(FILE_HEADER_SIZE)
+        header[0:8] = FILE_MAGIC
+        struct.pack_into('<QQQIHHHH', header, 8,
+                         0, max(self.chunk_count - 1, 0), self.next_record_id,
+                         0x80, 1, 3, FILE_HEADER_SIZE, self.chunk_count)
+        struct.pack_into('<I', header, 0x7C, zlib.crc32(header[0:0x78]))
+        self.file.seek(0)
+        self.file.write(header)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+class EventValueFactory:
+    """按配置的基数生成各事件的 Data 值"""
+
+    def __init__(self, rng, ip_count=100, user_count=50, process_count=30):
+        self.rng = rng
+        self.ips = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(max(ip_count, 1))]
+        self.users = [f"user{i:05d}" for i in range(max(user_count, 1))]
+        processes = ['w3wp.exe', 'ssms.exe'] + [f"proc{i:04d}.exe" for i in range(max(process_count - 2, 0))]
+        self.processes = [f"C:\\Windows\\System32\\{name}" for name in processes[:max(process_count, 1)]]
+
+    def values(self, event_id):
+        rng = self.rng
+        if event_id == 4625:
+            return [
+                "S-1-0-0", "-", "-", "0x0", "S-1-0-0", rng.choice(self.users), "WORKGROUP",
+                "0xc000006d", "%%2313", "0xc000006a", "3", "NtLmSsp ", "NTLM",
+                f"WKS-{rng.randrange(1000):03d}", "-", "-", "0", "0x0", "-",
+                rng.choice(self.ips), str(rng.randrange(1024, 65536)),
+            ]
+        if event_id == 4688:
+            process = rng.choice(self.processes)
+            return [
+                "S-1-5-18", "HOST$", "WORKGROUP", "0x3e7", hex(rng.randrange(4, 65536)), process,
+                "%%1936", hex(rng.randrange(4, 65536)), f"\"{process}\"", "S-1-0-0", "-", "-", "0x0",
+                rng.choice(self.processes), "S-1-16-16384",
+            ]
+        if event_id == 5156:
+            return [
+                str(rng.randrange(4, 65536)), rng.choice(self.processes).lower(),
+                rng.choice(("%%14592", "%%14593")), rng.choice(self.ips), str(rng.randrange(1024, 65536)),
+                rng.choice(self.ips), str(rng.choice((80, 443, 445, 1433, 3389))), "6", "0",
+                "%%14611", "48", "S-1-0-0", "S-1-0-0",
+            ]
+        if event_id == 7045:
+            index = rng.randrange(len(self.processes))
+            return [
+                f"svc{index:04d}", self.processes[index], "user mode service", "demand start", "LocalSystem",
+            ]
+        if event_id == 18456:
+            return [
+                rng.choice(self.users), "Reason: Password did not match that for the login provided.",
+                f"[CLIENT: {rng.choice(self.ips)}]",
+            ]
+        raise ValueError(f"Unsupported event ID {event_id}")
+
+
+def generate_evtx(path, record_count, event_mix=None, ip_count=100, user_count=50, process_count=30,
+                  computer="HOST-01", first_record_id=1, start_time=None, seed=0,
+                  chunk_fill=1.0, max_records_per_chunk=None, trailing_empty_chunks=0):
+    """
+    生成一个合成的 evtx 文件
+
+    :param path: 输出文件路径
+    :param record_count: 记录数
+    :param event_mix: {事件ID: 权重}，默认 DEFAULT_EVENT_MIX
+    :param ip_count: 不同 IP 的个数
+    :param user_count: 不同用户名的个数
+    :param process_count: 不同进程的个数
+    :param computer: System/Computer 的值
+    :param first_record_id: 第一条记录的 EventRecordID，用于构造相互重叠的采集副本
+    :param start_time: 第一条记录的时间（带时区的 datetime），默认 2025-01-01 UTC
+    :param seed: 随机种子，相同参数和种子生成的文件完全一致
+    :return: {'records': 记录数, 'chunks': chunk 数, 'event_counts': {事件ID: 数量}}
+    """
+    event_mix = event_mix or DEFAULT_EVENT_MIX
+    rng = random.Random(seed)
+    factory = EventValueFactory(rng, ip_count, user_count, process_count)
+    event_ids = list(event_mix)
+    weights = [event_mix[event_id] for event_id in event_ids]
+    time_created = start_time or datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    event_counts = dict.fromkeys(event_ids, 0)
+
+    with EvtxWriter(path, chunk_fill, max_records_per_chunk, trailing_empty_chunks) as writer:
+        for i in range(record_count):
+            event_id = rng.choices(event_ids, weights)[0]
+            event_counts[event_id] += 1
+            time_created += datetime.timedelta(milliseconds=rng.randrange(1, 2000))
+            writer.write(first_record_id + i, time_created, event_id, computer, factory.values(event_id))
+        chunk_count = writer.chunk_count + (1 if writer.chunk is not None else 0)
+
+    logging.info(f"Generated {record_count} records in {chunk_count} chunks: {path}")
+    return {'records': record_count, 'chunks': chunk_count, 'event_counts': event_counts}
+
+
+def parse_event_mix(text):
+    """解析 "4625=0.7,4688=0.3" 形式的事件比例"""
+    mix = {}
+    for item in text.split(','):
+        event_id, weight = item.split('=')
+        mix[int(event_id)] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s][%(levelname)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic .evtx file")
+    parser.add_argument("path")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--mix", type=parse_event_mix, default=None, help="e.g. 4625=0.7,4688=0.3")
+    parser.add_argument("--ips", type=int, default=100)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=30)
+    parser.add_argument("--computer", default="HOST-01")
+    parser.add_argument("--first-record-id", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-fill", type=float, default=1.0)
+    parser.add_argument("--max-records-per-chunk", type=int, default=None)
+    parser.add_argument("--trailing-empty-chunks", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_evtx(
+        args.path, args.records, event_mix=args.mix, ip_count=args.ips, user_count=args.users,
+        process_count=args.processes, computer=args.computer, first_record_id=args.first_record_id,
+        seed=args.seed, chunk_fill=args.chunk_fill, max_records_per_chunk=args.max_records_per_chunk,
+        trailing_empty_chunks=args.trailing_empty_chunks,
+    )
@@ -0,0 +1,437 @@
+"""
+evtx_reader.py
+
+EvtxFileReader 类是不依赖 pywin32 的纯 Python evtx 读取后端，基于 python-evtx（pip install python-evtx）。
+
+功能说明：
+- 直接解析 evtx 文件（文件路径，或内存中的 bytes/mmap 缓冲区），按 chunk 遍历记录，可在 Linux 上运行。
+- 把记录转换为与 pywin32 PyEventLogRecord 字段一致的 EvtxRecord（RecordNumber、EventID、TimeGenerated、
+  StringInserts 等），现有处理器无需修改即可使用。
+- 每个模板只编译一次字段位置（EventID、EventData/Data 等对应的替换值下标），过滤阶段只读取事件ID这一个
+  替换值，只有需要处理的记录才完整解析，降低扫描开销。
+- 提供 chunk 头和数据校验（CRC32），供数据恢复等场景复用。
+
+使用示例：
+    with EvtxFileReader(evtx_path) as reader:
+        first, total = reader.get_log_info()
+        for chunk in reader.iter_chunks(first, first + total - 1):
+            for offset in chunk.record_offsets():
+                if chunk.event_id(offset) == 4625:
+                    record = chunk.parse_record(offset)
+
+作者：
+日期：
+"""
+
+import os
+import mmap
+import zlib
+import struct
+import logging
+import datetime
+
+try:
+    from Evtx.Evtx import ChunkHeader
+    from Evtx import Nodes as e_nodes
+except ImportError:
+    # 纯 Python 后端是可选的，只有在用到时才要求安装 python-evtx
+    ChunkHeader = None
+    e_nodes = None
+
+FILE_MAGIC = b'ElfFile\x00'
+CHUNK_MAGIC = b'ElfChnk\x00'
+RECORD_MAGIC = 0x00002a2a
+FILE_HEADER_SIZE = 0x1000
+CHUNK_SIZE = 0x10000
+CHUNK_HEADER_SIZE = 0x200
+
+# 替换值类型，见 [MS-EVEN6] BinXml 值类型
+TYPE_WSTRING = 0x01
+TYPE_UINT8 = 0x04
+TYPE_UINT16 = 0x06
+TYPE_UINT32 = 0x08
+TYPE_UINT64 = 0x0A
+TYPE_FILETIME = 0x11
+TYPE_HEX32 = 0x14
+TYPE_HEX64 = 0x15
+TYPE_BXML = 0x21
+
+# 常见整数类型直接用 struct 解码，其余类型交给 python-evtx
+_INT_FORMATS = {TYPE_UINT8: '<B', TYPE_UINT16: '<H', TYPE_UINT32: '<I', TYPE_UINT64: '<Q'}
+_HEX_FORMATS = {TYPE_HEX32: '<I', TYPE_HEX64: '<Q'}
+
+_SYSTEM_FIELDS = ('EventID', 'EventRecordID', 'Computer', 'Channel')
+_FILETIME_EPOCH = datetime.datetime(1601, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def require_python_evtx():
+    if ChunkHeader is None:
+        raise ImportError("The pure Python evtx backend requires python-evtx: pip install python-evtx")
+
+
+def filetime_to_datetime(value):
+    """FILETIME（100ns，自1601年起）转为带 UTC 时区的 datetime"""
+    return _FILETIME_EPOCH + datetime.timedelta(microseconds=value // 10)
+
+
+def verify_chunk(buf, offset):
+    """校验 offset 处的 chunk：魔数、头部 CRC32 和记录数据 CRC32"""
+    if bytes(buf[offset:offset + 8]) != CHUNK_MAGIC:
+        return False
+    header_checksum = zlib.crc32(buf[offset:offset + 0x78])
+    header_checksum = zlib.crc32(buf[offset + 0x80:offset + CHUNK_HEADER_SIZE], header_checksum)
+    if header_checksum != struct.unpack_from('<I', buf, offset + 0x7C)[0]:
+        return False
+    next_record_offset = struct.unpack_from('<I', buf, offset + 0x30)[0]
+    if not CHUNK_HEADER_SIZE <= next_record_offset <= CHUNK_SIZE:
+        return False
+    data_checksum = zlib.crc32(buf[offset + CHUNK_HEADER_SIZE:offset + next_record_offset])
+    return data_checksum == struct.unpack_from('<I', buf, offset + 0x34)[0]
+
+
+class EvtxRecord:
+    """与 pywin32 PyEventLogRecord 字段保持一致的事件记录，只包含 Python 对象，不引用底层缓冲区"""
+
+    __slots__ = ('RecordNumber', 'EventID', 'TimeGenerated', 'StringInserts',
+                 'ComputerName', 'SourceName', 'Channel')
+
+    def __init__(self, record_number, event_id, time_generated, string_inserts,
+                 computer_name='', source_name='', channel=''):
+        self.RecordNumber = record_number
+        self.EventID = event_id
+        self.TimeGenerated = time_generated
+        self.StringInserts = string_inserts
+        self.ComputerName = computer_name
+        self.SourceName = source_name
+        self.Channel = channel
+
+    def __repr__(self):
+        return f"EvtxRecord(RecordNumber={self.RecordNumber}, EventID={self.EventID}, Channel={self.Channel!r})"
+
+
+def _compile_template(template):
+    """
+    遍历模板一次，记录各字段由哪些部分组成。
+    每个字段是 parts 列表，元素为字面字符串或替换值下标（int）。
+    """
+    plan = {'fields': {}, 'data': [], 'nested': []}
+
+    def parts_of(node):
+        if isinstance(node, e_nodes.ValueNode):
+            return [node.children()[0].string()]
+        if isinstance(node, (e_nodes.NormalSubstitutionNode, e_nodes.ConditionalSubstitutionNode)):
+            if node.type() == TYPE_BXML:
+                # 嵌套的 BinXml 片段（常见于 EventData/UserData），解析时递归展开
+                plan['nested'].append(node.index())
+                return []
+            return [node.index()]
+        if isinstance(node, e_nodes.CDataSectionNode):
+            return [node.cdata()]
+        return []
+
+    def walk(node, path):
+        for child in node.children():
+            if not isinstance(child, e_nodes.OpenStartElementNode):
+                if not path:
+                    parts_of(child)
+                continue
+
+            name = child.tag_name()
+            child_path = path + (name,)
+            attrs = {}
+            parts = []
+            is_leaf = True
+            for sub in child.children():
+                if isinstance(sub, e_nodes.AttributeNode):
+                    attrs[sub.attribute_name().string()] = parts_of(sub.attribute_value())
+                elif isinstance(sub, e_nodes.OpenStartElementNode):
+                    is_leaf = False
+                else:
+                    parts.extend(parts_of(sub))
+
+            if path and path[-1] == 'System':
+                if name in _SYSTEM_FIELDS:
+                    plan['fields'][name] = parts
+                elif name == 'TimeCreated':
+                    plan['fields']['TimeCreated'] = attrs.get('SystemTime', [])
+                elif name == 'Provider':
+                    plan['fields']['Provider'] = attrs.get('Name', [])
+            elif 'EventData' in path and name == 'Data':
+                plan['data'].append(parts)
+            elif 'UserData' in path and is_leaf:
+                plan['data'].append(parts)
+
+            walk(child, child_path)
+
+    walk(template, ())
+    return plan
+
+
+class EvtxChunk:
+    """单个 chunk 内记录的遍历和解析"""
+
+    def __init__(self, buf, offset, plans):
+        self.buf = buf
+        self.offset = offset
+        self.plans = plans  # {(模板GUID, 模板长度): plan}，由 EvtxFileReader 在所有 chunk 间共享
+        self.header = ChunkHeader(buf, offset)
+        (self.first_record, self.last_record,
+         self.log_first_record, self.log_last_record) = struct.unpack_from('<QQQQ', buf, offset + 8)
+        self.next_record_offset = struct.unpack_from('<I', buf, offset + 0x30)[0]
+
+    def record_count(self):
+        if self.next_record_offset <= CHUNK_HEADER_SIZE or self.log_last_record < self.log_first_record:
+            return 0
+        return self.log_last_record - self.log_first_record + 1
+
+    def record_offsets(self, start=None, end=None):
+        """按顺序返回记录号在 [start, end] 内的记录绝对偏移，遇到损坏的记录即停止"""
+        buf = self.buf
+        ofs = self.offset + CHUNK_HEADER_SIZE
+        limit = self.offset + min(self.next_record_offset, CHUNK_SIZE)
+        while ofs + 0x18 <= limit:
+            magic, size, record_num = struct.unpack_from('<IIQ', buf, ofs)
+            if magic != RECORD_MAGIC or size < 0x1C or ofs + size > limit:
+                break
+            if end is not None and record_num > end:
+                break
+            if start is None or record_num >= start:
+                yield ofs
+            ofs += size
+
+    def record_number(self, record_offset):
+        return struct.unpack_from('<Q', self.buf, record_offset + 8)[0]
+
+    # ---------- 模板和替换值 ----------
+
+    def _root_layout(self, root_offset):
+        """返回 (模板plan, 替换值表)，替换值表为 [(绝对偏移, 长度, 类型), ...]"""
+        buf = self.buf
+        inst = root_offset + 4 if buf[root_offset] & 0x0F == 0x0F else root_offset
+        template_offset = struct.unpack_from('<I', buf, inst + 6)[0]
+        sub_table = inst + 10
+        if template_offset > inst - self.offset:
+            # 模板定义紧跟在模板实例之后（该 chunk 内首次出现）
+            sub_table += 0x18 + struct.unpack_from('<I', buf, self.offset + template_offset + 0x14)[0]
+
+        # 同一 GUID 的模板在不同 chunk 中结构相同，只是名称偏移不同，因此只编译一次
+        template_start = self.offset + template_offset
+        plan_key = (bytes(buf[template_start + 4:template_start + 0x14]),
+                    struct.unpack_from('<I', buf, template_start + 0x14)[0])
+        plan = self.plans.get(plan_key)
+        if plan is None:
+            template = self.header.add_template(template_offset)
+            plan = _compile_template(template)
+            self.plans[plan_key] = plan
+
+        count = struct.unpack_from('<I', buf, sub_table)[0]
+        ofs = sub_table + 4 + count * 4
+        subs = []
+        for i in range(count):
+            size, type_ = struct.unpack_from('<HB', buf, sub_table + 4 + i * 4)
+            subs.append((ofs, size, type_))
+            ofs += size
+        return plan, subs
+
+    def _sub_string(self, sub):
+        ofs, size, type_ = sub
+        if size == 0:
+            return ''
+        if type_ == TYPE_WSTRING:
+            return bytes(self.buf[ofs:ofs + size]).decode('utf-16-le', errors='replace').rstrip('\x00')
+        fmt = _INT_FORMATS.get(type_)
+        if fmt is not None and size == struct.calcsize(fmt):
+            return str(struct.unpack_from(fmt, self.buf, ofs)[0])
+        fmt = _HEX_FORMATS.get(type_)
+        if fmt is not None and size == struct.calcsize(fmt):
+            return hex(struct.unpack_from(fmt, self.buf, ofs)[0])
+        node = e_nodes.get_variant_value(self.buf, ofs, self.header, self.header, type_, length=size)
+        return node.string()
+
+    def _resolve(self, parts, subs):
+        values = []
+        for part in parts:
+            if isinstance(part, str):
+                values.append(part)
+            elif part < len(subs):
+                values.append(self._sub_string(subs[part]))
+        return ''.join(values)
+
+    def event_id(self, record_offset):
+        """只读取事件ID，用于在完整解析之前过滤记录；解析失败返回 None"""
+        try:
+            plan, subs = self._root_layout(record_offset + 0x18)
+            parts = plan['fields'].get('EventID')
+            if not parts:
+                return None
+            if len(parts) == 1 and isinstance(parts[0], int) and parts[0] < len(subs):
+                ofs, size, type_ = subs[parts[0]]
+                if type_ == TYPE_UINT16 and size == 2:
+                    return struct.unpack_from('<H', self.buf, ofs)[0]
+            return int(self._resolve(parts, subs)) & 0xFFFF
+        except Exception as e:
+            logging.debug(f"Failed to read event id at {record_offset:#x}: {e}")
+            return None
+
+    def record_source(self, record_offset):
+        """只解析计算机名和通道，返回 (Computer, Channel)，用于跨文件去重"""
+        plan, subs = self._root_layout(record_offset + 0x18)
+        fields = plan['fields']
+        return self._resolve(fields.get('Computer', ()), subs), self._resolve(fields.get('Channel', ()), subs)
+
+    def _collect(self, root_offset, fields, data):
+        plan, subs = self._root_layout(root_offset)
+        for name, parts in plan['fields'].items():
+            if name == 'TimeCreated' and len(parts) == 1 and isinstance(parts[0], int) and parts[0] < len(subs):
+                ofs, size, type_ = subs[parts[0]]
+                if type_ == TYPE_FILETIME and size == 8:
+                    fields[name] = filetime_to_datetime(struct.unpack_from('<Q', self.buf, ofs)[0])
+                    continue
+            fields[name] = self._resolve(parts, subs)
+        for parts in plan['data']:
+            data.append(self._resolve(parts, subs))
+        for index in plan['nested']:
+            if index < len(subs) and subs[index][1] > 0:
+                self._collect(subs[index][0], fields, data)
+
+    def parse_record(self, record_offset):
+        """完整解析一条记录，返回 EvtxRecord"""
+        record_num, timestamp = struct.unpack_from('<QQ', self.buf, record_offset + 8)
+        fields = {}
+        data = []
+        self._collect(record_offset + 0x18, fields, data)
+
+        time_generated = fields.get('TimeCreated')
+        if not isinstance(time_generated, datetime.datetime):
+            time_generated = filetime_to_datetime(timestamp)
+        try:
+            event_id = int(fields.get('EventID', '')) & 0xFFFF
+        except ValueError:
+            event_id = 0
+
+        return EvtxRecord(
+            record_number=record_num,
+            event_id=event_id,
+            time_generated=time_generated,
+            string_inserts=tuple(data) if data else None,
+            computer_name=fields.get('Computer', ''),
+            source_name=fields.get('Provider', ''),
+            channel=fields.get('Channel', ''),
+        )
+
+
+class ChunkSplitter:
+    """把顺序到达的 evtx 字节流切分为 64KB 的 chunk（跳过文件头），用于不落盘的流式读取"""
+
+    def __init__(self):
+        self.pending = bytearray()
+        self.header_done = False
+        self.valid = True
+
+    def feed(self, data):
+        """追加数据，返回已凑齐且魔数正确的 chunk 列表；文件头魔数不对时 valid 置为 False"""
+        if not self.valid:
+            return []
+        pending = self.pending
+        pending += data
+        pos = 0
+        if not self.header_done:
+            if len(pending) < FILE_HEADER_SIZE:
+                return []
+            if pending[:8] != FILE_MAGIC:
+                logging.error("Not an evtx stream (bad file header magic)")
+                self.valid = False
+                pending.clear()
+                return []
+            self.header_done = True
+            pos = FILE_HEADER_SIZE
+
+        chunks = []
+        while len(pending) - pos >= CHUNK_SIZE:
+            if pending[pos:pos + 8] == CHUNK_MAGIC:
+                chunks.append(bytes(pending[pos:pos + CHUNK_SIZE]))
+            pos += CHUNK_SIZE
+        del pending[:pos]
+        return chunks
+
+
+def iter_chunk_buffers(fileobj, read_size=1 << 20):
+    """从文件对象顺序读取 evtx 内容，逐个返回 chunk 缓冲区"""
+    splitter = ChunkSplitter()
+    while splitter.valid:
+        data = fileobj.read(read_size)
+        if not data:
+            break
+        yield from splitter.feed(data)
+
+
+class EvtxFileReader:
+    def __init__(self, source):
+        """
+        :param source: evtx 文件路径，或包含完整 evtx 内容的 bytes/bytearray/memoryview/mmap
+        """
+        require_python_evtx()
+        self.source = source
+        self.buf = None
+        self._file = None
+        self._mmap = None
+        self.plans = {}
+
+    def __enter__(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            self._file = open(self.source, 'rb')
+            if os.fstat(self._file.fileno()).st_size == 0:
+                self.buf = b''
+            else:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.buf = self._mmap
+        else:
+            self.buf = self.source
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.buf = None
+
+    def chunk_offsets(self):
+        """返回文件中所有魔数正确的 chunk 偏移（不依赖文件头中可能过期的 chunk 数）"""
+        offsets = []
+        ofs = FILE_HEADER_SIZE
+        while ofs + CHUNK_SIZE <= len(self.buf):
+            if self.buf[ofs:ofs + 8] == CHUNK_MAGIC:
+                offsets.append(ofs)
+            ofs += CHUNK_SIZE
+        return offsets
+
+    def get_log_info(self):
+        """获取日志文件的最早记录号和总记录数，与 win32evtlog 后端的返回值含义一致"""
+        if self.buf[:8] != FILE_MAGIC:
+            raise ValueError("Not an evtx file (bad file header magic)")
+        first = None
+        total = 0
+        for ofs in self.chunk_offsets():
+            chunk = EvtxChunk(self.buf, ofs, self.plans)
+            count = chunk.record_count()
+            if count == 0:
+                continue
+            total += count
+            if first is None or chunk.log_first_record < first:
+                first = chunk.log_first_record
+        return (first or 1), total
+
+    def iter_chunks(self, start=None, end=None):
+        """按顺序返回包含 [start, end] 范围内记录的 chunk"""
+        for ofs in self.chunk_offsets():
+            chunk = EvtxChunk(self.buf, ofs, self.plans)
+            if chunk.record_count() == 0:
+                continue
+            if end is not None and chunk.log_first_record > end:
+                continue
+            if start is not None and chunk.log_last_record < start:
+                continue
+            yield chunk
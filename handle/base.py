@@ -1,6 +1,26 @@
 import logging
+import datetime
+import threading
 import traceback
 
+# 处理器在 handle() 中自行捕获并记录异常，出错次数按线程记录，供 PipelineMetrics 统计处理出错数
+_error_state = threading.local()
+
+
+def handler_error_count():
+    """当前线程中处理器已捕获的异常次数"""
+    return getattr(_error_state, 'count', 0)
+
+
+def datetime_to_json(value):
+    """export_result 中的时间统一转为 ISO 格式字符串，None 保持不变"""
+    return value.isoformat() if value is not None else None
+
+
+def datetime_from_json(value):
+    return datetime.datetime.fromisoformat(value) if value is not None else None
+
+
 class EventHandler:
     def __init__(self):
         self.results = None
@@ -19,9 +39,28 @@ class EventHandler:
         """
         raise NotImplementedError("Subclasses must implement this method.")
 
+    def report_error(self):
+        """
+        handle() 捕获到异常时调用，用于统计处理出错数
+        """
+        _error_state.count = handler_error_count() + 1
+
     def save_analyze_result(self, output_dir):
         """
         保存分析结果，子类必须实现
         :param output_dir: 结果保存目录
         """
         raise NotImplementedError("Subclasses must implement this method.")
+
+    def export_result(self):
+        """
+        导出可 JSON 序列化的部分结果，用于分布式分析时把 worker 的结果发回协调节点，子类必须实现
+        """
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def merge_result(self, data):
+        """
+        合并其他处理器 export_result 导出的部分结果，子类必须实现
+        :param data: export_result 的返回值
+        """
+        raise NotImplementedError("Subclasses must implement this method.")
@@ -23,7 +23,7 @@ import os
 import logging
 import traceback
 from collections import defaultdict
-from .base import EventHandler
+from .base import EventHandler, datetime_to_json, datetime_from_json
 
 class Event18456Handler(EventHandler):
     def init_result(self):
@@ -60,6 +60,7 @@ class Event18456Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event18456Handler.handle error: {e}")
             logging.error(traceback.format_exc())
+            self.report_error()
 
     def save_analyze_result(self, output_dir):
         if self.results['total_events'] == 0:
@@ -90,3 +91,26 @@ class Event18456Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event18456Handler.save_analyze_result error: {e}")
             logging.error(traceback.format_exc())
+
+    def export_result(self):
+        return {
+            "start_time": datetime_to_json(self.results['start_time']),
+            "end_time": datetime_to_json(self.results['end_time']),
+            "total_events": self.results['total_events'],
+            "user_login_counts": dict(self.results['user_login_counts']),
+            "ip_login_counts": dict(self.results['ip_login_counts']),
+        }
+
+    def merge_result(self, data):
+        start_time = datetime_from_json(data['start_time'])
+        if start_time is not None and (self.results['start_time'] is None or start_time < self.results['start_time']):
+            self.results['start_time'] = start_time
+        end_time = datetime_from_json(data['end_time'])
+        if end_time is not None and (self.results['end_time'] is None or end_time > self.results['end_time']):
+            self.results['end_time'] = end_time
+
+        self.results['total_events'] += data['total_events']
+        for user, count in data['user_login_counts'].items():
+            self.results['user_login_counts'][user] += count
+        for ip, count in data['ip_login_counts'].items():
+            self.results['ip_login_counts'][ip] += count
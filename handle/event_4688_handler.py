@@ -25,7 +25,7 @@ Event4688Handler 类用于处理 Windows 安全事件 ID 4688（新进程创建
 import os
 import logging
 import traceback
-from .base import EventHandler
+from .base import EventHandler, datetime_to_json, datetime_from_json
 
 class Event4688Handler(EventHandler):
     def __init__(self, target_processes=None):
@@ -68,6 +68,7 @@ class Event4688Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event4688Handler.handle error: {e}")
             logging.error(traceback.format_exc())
+            self.report_error()
 
     def save_analyze_result(self, output_dir):
         try:
@@ -107,5 +108,14 @@ class Event4688Handler(EventHandler):
             logging.error(f"Event4688Handler.save_analyze_result error: {e}")
             logging.error(traceback.format_exc())
 
-
-
+    def export_result(self):
+        return {
+            "process_names": sorted(self.results),
+            "detailed": [dict(item, TimeGenerated=datetime_to_json(item["TimeGenerated"]))
+                         for item in self.results_detailed],
+        }
+
+    def merge_result(self, data):
+        self.results.update(data['process_names'])
+        for item in data['detailed']:
+            self.results_detailed.append(dict(item, TimeGenerated=datetime_from_json(item["TimeGenerated"])))
@@ -32,7 +32,7 @@ import os
 import logging
 import traceback
 from collections import defaultdict
-from .base import EventHandler
+from .base import EventHandler, datetime_to_json, datetime_from_json
 
 class Event5156Handler(EventHandler):
     def init_result(self):
@@ -71,6 +71,7 @@ class Event5156Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event5156Handler.handle error: {e}")
             logging.error(traceback.format_exc())
+            self.report_error()
 
     def save_analyze_result(self, output_dir):
         if not self.results:
@@ -114,3 +115,15 @@ class Event5156Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event5156Handler.save_analyze_result error: {e}")
             logging.error(traceback.format_exc())
+
+    def export_result(self):
+        return {
+            app: {direction: [dict(info, time=datetime_to_json(info['time'])) for info in infos]
+                  for direction, infos in connections.items()}
+            for app, connections in self.results.items()
+        }
+
+    def merge_result(self, data):
+        for app, connections in data.items():
+            for direction, infos in connections.items():
+                self.results[app][direction].extend(dict(info, time=datetime_from_json(info['time'])) for info in infos)
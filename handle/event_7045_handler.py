@@ -42,6 +42,7 @@ class Event7045Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event7045Handler.handle error: {e}")
             logging.error(traceback.format_exc())
+            self.report_error()
 
     def save_analyze_result(self, output_dir):
         if not self.results:
@@ -67,3 +68,10 @@ class Event7045Handler(EventHandler):
         except Exception as e:
             logging.error(f"Event7045Handler.save_analyze_result error: {e}")
             logging.error(traceback.format_exc())
+
+    def export_result(self):
+        # StartTime 在 handle 中已格式化为字符串，可直接序列化
+        return list(self.results)
+
+    def merge_result(self, data):
+        self.results.extend(data)
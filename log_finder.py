@@ -1,6 +1,10 @@
 import os
 import logging
 from event_log_analyzer import EventLogAnalyzer
+from metrics import PipelineMetrics, MetricsReporter
+from archive_reader import ArchiveStreamer, is_archive, archive_stem, safe_member_dir
+from dedup import RecordDeduplicator
+from carver import EvtxCarver
 from handle import (
     Event4625Handler,
     Event18456Handler,
@@ -15,14 +19,104 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-def find_and_analyze_evtx_logs(root_log_dir, analysis_root_dir, target_event_ids=None, need_result=None):
+def create_handlers(target_event_ids):
+    """按事件ID列表创建对应的处理器，返回 {event_id: handler}"""
+    handlers = {}
+    for event_id in target_event_ids:
+        if event_id == 4625:
+            handlers[4625] = Event4625Handler()
+        elif event_id == 18456:
+            handlers[18456] = Event18456Handler()
+        elif event_id == 7045:
+            handlers[7045] = Event7045Handler()
+        elif event_id == 4688:
+            handlers[4688] = Event4688Handler()
+        elif event_id == 5156:
+            handlers[5156] = Event5156Handler()
+        else:
+            logging.warning(f"No handler registered for event ID {event_id}")
+    return handlers
+
+
+def register_handlers(analyzer, target_event_ids, handlers=None):
+    """
+    为分析器注册处理器
+    :param handlers: 合并分析时所有文件共用的处理器，None 表示为该分析器新建处理器
+    """
+    if handlers is None:
+        handlers = create_handlers(target_event_ids)
+    for event_id, handler in handlers.items():
+        analyzer.register_handler(event_id, handler)
+
+
+def analyze_archive(archive_path, root_log_dir, analysis_root_dir, target_event_ids, need_result=None, metrics=None,
+                    deduplicator=None, handlers=None):
+    """
+    不解压到磁盘，流式分析压缩包中的evtx日志。
+    结果保存在 分析结果根目录/压缩包相对目录/压缩包名(去掉后缀)/成员相对目录 下，与解压后再分析的目录结构一致。
+    handlers 不为 None 时为合并分析，结果由调用方统一保存。
+    """
+    rel_dir = os.path.dirname(os.path.relpath(archive_path, root_log_dir))
+    archive_dir = os.path.join(analysis_root_dir, rel_dir, archive_stem(os.path.basename(archive_path)))
+
+    logging.info(f"Found archive: {archive_path}")
+    with ArchiveStreamer(archive_path, need_result=need_result) as streamer:
+        for member in streamer:
+            save_dir = os.path.join(archive_dir, safe_member_dir(member.name))
+            logging.info(f"Found log: {member.display_path}")
+            if handlers is None:
+                os.makedirs(save_dir, exist_ok=True)
+                logging.info(f"Saving analysis to: {save_dir}")
+
+            # 压缩包成员只能用纯 Python 后端流式读取
+            analyzer = EventLogAnalyzer(member.display_path, save_dir, metrics=metrics, backend='python',
+                                        deduplicator=deduplicator)
+            register_handlers(analyzer, target_event_ids, handlers)
+            analyzer.run(num_workers=4, chunks=member.chunks(), save_results=handlers is None)
+
+
+def analyze_image(image_path, analysis_root_dir, target_event_ids, metrics=None, dedup=True, processes=None,
+                  segment_size=64 << 20, salvage=True):
     """
-    递归查找evtx日志文件，分析并保存结果。
+    从原始磁盘镜像、pagefile、未分配空间等数据中恢复 evtx chunk 并分析，
+    结果保存在 分析结果根目录/镜像文件名_carved 下，返回恢复统计（EvtxCarver.stats，
+    另加 read_errors：恢复的 chunk 中无法解析而丢弃的记录或 chunk 数）。
+    :param dedup: 镜像中同一 chunk 常有多个版本，默认按 (计算机名, 通道, EventRecordID) 去重
+    """
+    save_dir = os.path.join(analysis_root_dir, os.path.basename(image_path) + "_carved")
+    os.makedirs(save_dir, exist_ok=True)
+    logging.info(f"Carving image: {image_path}")
+    logging.info(f"Saving analysis to: {save_dir}")
+
+    carver = EvtxCarver(image_path, processes=processes, segment_size=segment_size, salvage=salvage)
+    deduplicator = RecordDeduplicator() if dedup else None
+    try:
+        # 恢复的 chunk 来自不同的日志文件，只能用纯 Python 后端按 chunk 流读取
+        analyzer = EventLogAnalyzer(image_path, save_dir, metrics=metrics, backend='python',
+                                    deduplicator=deduplicator)
+        register_handlers(analyzer, target_event_ids)
+        analyzer.run(num_workers=4, chunks=carver.iter_chunks())
+    finally:
+        if deduplicator is not None:
+            deduplicator.close()
+    if analyzer.read_errors:
+        logging.warning(f"{analyzer.read_errors} carved records or chunks could not be parsed and were skipped")
+    return dict(carver.stats, read_errors=analyzer.read_errors)
+
+
+def find_and_analyze_evtx_logs(root_log_dir, analysis_root_dir, target_event_ids=None, need_result=None, metrics=None,
+                               dedup=False, merge_results=False):
+    """
+    递归查找evtx日志文件（包括 zip、tar.gz、7z 等压缩包中的evtx文件），分析并保存结果。
 
     :param root_log_dir: 日志根目录，递归查找evtx文件
     :param analysis_root_dir: 分析结果根目录，保存结果时保持相对路径结构
     :param target_event_ids: 需要注册并分析的事件ID列表，默认只分析4625
     :param need_result: 只分析文件名在此列表中的日志文件，默认None表示分析所有evtx文件
+    :param metrics: 可选的 PipelineMetrics 实例，所有文件共用，用于统计流水线指标和各文件进度
+    :param dedup: 按 (计算机名, 通道, EventRecordID) 跨文件去重，同一主机的重叠采集副本中的记录只处理一次；
+                  去重只对合并结果有意义，因此同时打开 merge_results
+    :param merge_results: 所有文件共用一组处理器，结果合并保存在 analysis_root_dir 下，而不是按目录分别保存
     """
     if target_event_ids is None:
         target_event_ids = [4625]
@@ -31,46 +125,65 @@ def find_and_analyze_evtx_logs(root_log_dir, analysis_root_dir, target_event_ids
         # 统一小写，方便匹配
         need_result = set(name.lower() for name in need_result)
 
-    for dirpath, _, filenames in os.walk(root_log_dir):
-        for filename in filenames:
-            if filename.lower().endswith('.evtx'):
-                if need_result is not None and filename.lower() not in need_result:
-                    # 跳过不在need_result列表中的文件
+    if dedup and not merge_results:
+        # 按目录分别保存时去重，重叠的记录只会出现在先遍历到的目录的报告中，结果取决于遍历顺序
+        logging.info("dedup=True implies merge_results=True, results are merged into the analysis root")
+        merge_results = True
+
+    handlers = create_handlers(target_event_ids) if merge_results else None
+    deduplicator = RecordDeduplicator() if dedup else None
+
+    try:
+        for dirpath, _, filenames in os.walk(root_log_dir):
+            for filename in filenames:
+                if is_archive(filename):
+                    analyze_archive(os.path.join(dirpath, filename), root_log_dir, analysis_root_dir,
+                                    target_event_ids, need_result=need_result, metrics=metrics,
+                                    deduplicator=deduplicator, handlers=handlers)
                     continue
 
-                full_log_path = os.path.join(dirpath, filename)
-                # 计算日志文件相对于root_log_dir的相对路径
-                rel_path = os.path.relpath(full_log_path, root_log_dir)
-                # 去掉文件名，保留目录结构
-                rel_dir = os.path.dirname(rel_path)
+                if filename.lower().endswith('.evtx'):
+                    if need_result is not None and filename.lower() not in need_result:
+                        # 跳过不在need_result列表中的文件
+                        continue
 
-                # 构造分析结果保存目录，保持原目录结构
-                save_dir = os.path.join(analysis_root_dir, rel_dir)
-                os.makedirs(save_dir, exist_ok=True)
+                    full_log_path = os.path.join(dirpath, filename)
+                    # 计算日志文件相对于root_log_dir的相对路径
+                    rel_path = os.path.relpath(full_log_path, root_log_dir)
+                    # 去掉文件名，保留目录结构
+                    rel_dir = os.path.dirname(rel_path)
 
-                logging.info(f"Found log: {full_log_path}")
-                logging.info(f"Saving analysis to: {save_dir}")
+                    # 构造分析结果保存目录，保持原目录结构
+                    save_dir = os.path.join(analysis_root_dir, rel_dir)
+
+                    logging.info(f"Found log: {full_log_path}")
+                    if handlers is None:
+                        os.makedirs(save_dir, exist_ok=True)
+                        logging.info(f"Saving analysis to: {save_dir}")
+
+                    # 创建分析器实例
+                    analyzer = EventLogAnalyzer(full_log_path, save_dir, metrics=metrics, deduplicator=deduplicator)
 
-                # 创建分析器实例
-                analyzer = EventLogAnalyzer(full_log_path, save_dir)
-
-                # 注册需要的事件处理器
-                for event_id in target_event_ids:
-                    if event_id == 4625:
-                        analyzer.register_handler(4625, Event4625Handler())
-                    elif event_id == 18456:
-                        analyzer.register_handler(18456, Event18456Handler())
-                    elif event_id == 7045:
-                        analyzer.register_handler(7045, Event7045Handler())
-                    elif event_id == 4688:
-                        analyzer.register_handler(4688, Event4688Handler())
-                    elif event_id == 5156:
-                        analyzer.register_handler(5156, Event5156Handler())
-                    else:
-                        logging.warning(f"No handler registered for event ID {event_id}")
-
-                # 运行分析
-                analyzer.run(num_producers=4, num_workers=4)
+                    # 注册需要的事件处理器
+                    register_handlers(analyzer, target_event_ids, handlers)
+
+                    # 运行分析
+                    analyzer.run(num_producers=4, num_workers=4, save_results=handlers is None)
+    finally:
+        if deduplicator is not None:
+            deduplicator.close()
+
+    if handlers is not None:
+        # 合并分析：所有文件的结果统一保存到分析结果根目录
+        logging.info(f"Saving merged analysis to: {analysis_root_dir}")
+        os.makedirs(analysis_root_dir, exist_ok=True)
+        for handler in handlers.values():
+            try:
+                handler.save_analyze_result(analysis_root_dir)
+            except Exception as e:
+                logging.error(f"Error saving results for handler {handler}: {e}")
+        if metrics:
+            metrics.dump_profiles(analysis_root_dir)
 
 if __name__ == "__main__":
     root_log_dir = r"E:\Develop\EveryDay\20250730\环境收集"
@@ -79,9 +192,29 @@ if __name__ == "__main__":
     # 只分析这些文件名的日志，None表示分析所有evtx文件
     need_result = ["系统.evtx", "安全.evtx", "应用程序.evtx"]
 
-    find_and_analyze_evtx_logs(
-        root_log_dir,
-        analysis_root_dir,
-        target_event_ids=[4625, 18456, 7045, 4688, 5156],
-        need_result=need_result
-    )
+    # 流水线指标，默认关闭；打开后每5秒写一次 metrics.json，同时可通过 http://127.0.0.1:8765/metrics 实时查看
+    enable_metrics = False
+    metrics = None
+    reporter = None
+    if enable_metrics:
+        metrics = PipelineMetrics()
+        reporter = MetricsReporter(
+            metrics,
+            json_path=os.path.join(analysis_root_dir, "metrics.json"),
+            interval=5,
+            http_port=8765
+        )
+        os.makedirs(analysis_root_dir, exist_ok=True)
+        reporter.start()
+
+    try:
+        find_and_analyze_evtx_logs(
+            root_log_dir,
+            analysis_root_dir,
+            target_event_ids=[4625, 18456, 7045, 4688, 5156],
+            need_result=need_result,
+            metrics=metrics
+        )
+    finally:
+        if reporter is not None:
+            reporter.stop()
@@ -0,0 +1,330 @@
+"""
+metrics.py
+
+PipelineMetrics 类用于采集 EventLogAnalyzer 读取/队列/处理流水线的运行指标。
+
+功能说明：
+- 分阶段计数：扫描记录数、过滤记录数、去重跳过数、入队数、处理数、处理出错数、读取出错数。
+- 直方图：事件在队列中的等待时间、生产者 put 被阻塞的时间、各事件ID处理器的耗时。
+- 按文件统计吞吐：已扫描记录数、进度百分比、每秒记录数和预计剩余时间（ETA）。
+- 可选的处理器采样分析：每 N 次调用对处理器做一次 cProfile，结果合并后保存为 .prof 文件。
+- MetricsReporter 支持定期把指标写入 JSON 文件，或通过本地 HTTP 接口实时查看。
+- 计数在读取批次级别累加，只做简单的加法和 perf_counter 调用，开销很低，可在生产环境常开。
+
+使用示例：
+    metrics = PipelineMetrics(profile_every=1000)
+    reporter = MetricsReporter(metrics, json_path="metrics.json", http_port=8765)
+    reporter.start()
+    analyzer = EventLogAnalyzer(evtx_path, save_dir, metrics=metrics)
+    analyzer.run()
+    reporter.stop()
+
+作者：
+日期：
+"""
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import traceback
+import cProfile
+import pstats
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from handle.base import handler_error_count
+
+
+class Histogram:
+    """固定分桶的耗时直方图（单位：秒），由 PipelineMetrics 的锁保证线程安全"""
+
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        buckets = {f"le_{bound}": count for bound, count in zip(self.BUCKETS, self.bucket_counts)}
+        buckets["le_inf"] = self.bucket_counts[-1]
+        return {
+            "count": self.count,
+            "total": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+class PipelineMetrics:
+    STAGES = ("scanned", "filtered", "deduplicated", "enqueued", "handled", "errored", "read_errors")
+
+    def __init__(self, profile_every=0):
+        """
+        :param profile_every: 每个事件ID的处理器每调用N次做一次 cProfile 采样，0 表示不采样
+        """
+        self.profile_every = profile_every
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.counters = dict.fromkeys(self.STAGES, 0)
+        self.queue_wait = Histogram()
+        self.put_block = Histogram()
+        self.handler_time = defaultdict(Histogram)  # {event_id: Histogram}
+        self.files = {}  # {evtx_path: {...}}
+
+        self._call_counts = defaultdict(int)  # {event_id: 调用次数}
+        self._profiles = {}  # {event_id: pstats.Stats}
+        self._profile_lock = threading.Lock()
+
+    # ---------- 计数 ----------
+
+    def add(self, stage, n=1):
+        """累加某个阶段的计数"""
+        with self.lock:
+            self.counters[stage] += n
+
+    def record_batch(self, evtx_path, scanned, enqueued, duplicates=0, errors=0):
+        """
+        读取线程每读完一批记录调用一次，同时更新阶段计数和文件进度。
+        errors 为本批中读取失败而跳过的记录数，计入 read_errors 而不计入 filtered
+        """
+        with self.lock:
+            self.counters['scanned'] += scanned
+            self.counters['filtered'] += scanned - enqueued - duplicates - errors
+            self.counters['deduplicated'] += duplicates
+            self.counters['read_errors'] += errors
+            self.counters['enqueued'] += enqueued
+            file_info = self.files.get(evtx_path)
+            if file_info is not None:
+                file_info['scanned'] += scanned
+
+    def observe_put_block(self, seconds):
+        with self.lock:
+            self.put_block.observe(seconds)
+
+    def observe_queue_wait(self, seconds):
+        with self.lock:
+            self.queue_wait.observe(seconds)
+
+    # ---------- 文件进度 ----------
+
+    def start_file(self, evtx_path, total):
+        """开始分析一个日志文件，total 为该文件的记录总数（用于进度和ETA），未知时为 None"""
+        with self.lock:
+            self.files[evtx_path] = {
+                'total': total,
+                'scanned': 0,
+                'start_time': time.time(),
+                'end_time': None,
+            }
+
+    def finish_file(self, evtx_path):
+        with self.lock:
+            file_info = self.files.get(evtx_path)
+            if file_info is not None:
+                file_info['end_time'] = time.time()
+
+    # ---------- 处理器计时与采样 ----------
+
+    def call_handler(self, event_id, handler, event):
+        """调用处理器并记录耗时，按 profile_every 采样做 cProfile；处理器内部捕获的异常计入 errored"""
+        errors_before = handler_error_count()
+        try:
+            self._call_handler(event_id, handler, event)
+        finally:
+            if handler_error_count() != errors_before:
+                self.add('errored')
+
+    def _call_handler(self, event_id, handler, event):
+        if self.profile_every:
+            with self.lock:
+                self._call_counts[event_id] += 1
+                sample = self._call_counts[event_id] % self.profile_every == 0
+            # cProfile 同一时刻只能有一个在运行，拿不到锁就跳过本次采样
+            if sample and self._profile_lock.acquire(blocking=False):
+                try:
+                    self._profile_call(event_id, handler, event)
+                finally:
+                    self._profile_lock.release()
+                return
+
+        start = time.perf_counter()
+        try:
+            handler.handle(event)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.handler_time[event_id].observe(elapsed)
+                self.counters['handled'] += 1
+
+    def _profile_call(self, event_id, handler, event):
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(handler.handle, event)
+        finally:
+            with self.lock:
+                self.counters['handled'] += 1
+                if event_id in self._profiles:
+                    self._profiles[event_id].add(profiler)
+                else:
+                    self._profiles[event_id] = pstats.Stats(profiler)
+
+    def dump_profiles(self, output_dir):
+        """把采样得到的处理器 profile 保存为 handler_<event_id>.prof，保存后清空，下一个文件重新采样"""
+        with self.lock:
+            profiles = list(self._profiles.items())
+            self._profiles = {}
+        if not profiles:
+            return
+
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            for event_id, stats in profiles:
+                file_path = os.path.join(output_dir, f"handler_{event_id}.prof")
+                stats.dump_stats(file_path)
+                logging.info(f"Handler profile for event {event_id} saved to: {file_path}")
+        except Exception as e:
+            logging.error(f"PipelineMetrics.dump_profiles error: {e}")
+            logging.error(traceback.format_exc())
+
+    # ---------- 输出 ----------
+
+    def snapshot(self):
+        """返回当前指标的可JSON序列化字典"""
+        now = time.time()
+        with self.lock:
+            elapsed = now - self.start_time
+            files = {}
+            for path, info in self.files.items():
+                file_elapsed = (info['end_time'] or now) - info['start_time']
+                rate = info['scanned'] / file_elapsed if file_elapsed > 0 else 0.0
+                finished = info['end_time'] is not None
+                if info['total'] is None:
+                    # 流式读取（如压缩包成员）时总数未知
+                    progress = 1.0 if finished else None
+                    eta = 0.0 if finished else None
+                else:
+                    remaining = max(info['total'] - info['scanned'], 0)
+                    progress = info['scanned'] / info['total'] if info['total'] else 1.0
+                    eta = 0.0 if finished else (remaining / rate if rate > 0 else None)
+                files[path] = {
+                    'total': info['total'],
+                    'scanned': info['scanned'],
+                    'progress': progress,
+                    'records_per_second': rate,
+                    'elapsed': file_elapsed,
+                    'eta_seconds': eta,
+                    'finished': finished,
+                }
+
+            return {
+                'timestamp': now,
+                'elapsed': elapsed,
+                'counters': dict(self.counters),
+                'records_per_second': self.counters['scanned'] / elapsed if elapsed > 0 else 0.0,
+                'queue_wait': self.queue_wait.to_dict(),
+                'put_block': self.put_block.to_dict(),
+                'handler_time': {str(eid): h.to_dict() for eid, h in self.handler_time.items()},
+                'files': files,
+            }
+
+    def save_json(self, file_path):
+        """原子地把当前指标写入 JSON 文件"""
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, file_path)
+
+
+class MetricsReporter:
+    def __init__(self, metrics, json_path=None, interval=5.0, http_host="127.0.0.1", http_port=None):
+        """
+        :param metrics: PipelineMetrics 实例
+        :param json_path: 定期写入的 JSON 文件路径，None 表示不写文件
+        :param interval: 写文件的间隔秒数
+        :param http_host: HTTP 接口监听地址，默认只监听本机
+        :param http_port: HTTP 接口端口，None 表示不启动 HTTP 接口
+        """
+        self.metrics = metrics
+        self.json_path = json_path
+        self.interval = interval
+        self.http_host = http_host
+        self.http_port = http_port
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.server = None
+
+    def start(self):
+        if self.json_path:
+            t = threading.Thread(target=self._write_loop, name="MetricsWriter")
+            t.daemon = True
+            self.threads.append(t)
+            t.start()
+
+        if self.http_port is not None:
+            try:
+                self.server = ThreadingHTTPServer((self.http_host, self.http_port), self._make_request_handler())
+            except OSError as e:
+                # 端口被占用等情况下不影响分析，只是不提供 HTTP 接口
+                logging.error(f"Failed to start metrics endpoint on {self.http_host}:{self.http_port}: {e}")
+                return
+            self.server.daemon_threads = True
+            t = threading.Thread(target=self.server.serve_forever, name="MetricsHTTP")
+            t.daemon = True
+            self.threads.append(t)
+            t.start()
+            logging.info(f"Metrics endpoint: http://{self.http_host}:{self.server.server_address[1]}/metrics")
+
+    def _write_loop(self):
+        while not self.stop_event.wait(self.interval):
+            self._write_once()
+
+    def _write_once(self):
+        try:
+            self.metrics.save_json(self.json_path)
+        except Exception as e:
+            logging.error(f"MetricsReporter write error: {e}")
+
+    def _make_request_handler(self):
+        metrics = self.metrics
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不把每次请求都打到日志里
+                pass
+
+        return MetricsRequestHandler
+
+    def stop(self):
+        """停止上报，并在退出前写一次最终指标"""
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for t in self.threads:
+            t.join()
+        if self.json_path:
+            self._write_once()
@@ -0,0 +1,141 @@
+"""
+archive_reader.py 的测试：ChunkSplitter 按任意大小的数据块切分与直接读取文件得到的 chunk 一致；
+zip、tar.gz、7z 压缩包流式分析的报告与解压后分析的报告一致，结果位于 压缩包名/成员相对目录 下。
+
+运行：python -m pytest -q tests
+"""
+
+import os
+import sys
+import random
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive_reader import py7zr, archive_stem, safe_member_dir
+from evtx_reader import ChunkHeader, ChunkSplitter, CHUNK_MAGIC, CHUNK_SIZE, FILE_HEADER_SIZE
+from evtx_generator import generate_evtx
+from log_finder import find_and_analyze_evtx_logs
+
+EVENT_IDS = [4625, 4688, 5156, 7045, 18456]
+MEMBERS = [("hostA", 3000), (os.path.join("hostB", "sub"), 1500), ("", 500)]
+
+
+def read_reports(root):
+    """{相对路径: 排序后的行}，多线程处理时同类记录的顺序不固定，因此按行排序后比较"""
+    reports = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, encoding='utf-8') as f:
+                reports[os.path.relpath(path, root)] = sorted(f.read().splitlines())
+    return reports
+
+
+class ArchivePathTest(unittest.TestCase):
+    def test_archive_stem(self):
+        self.assertEqual(archive_stem("host01.tar.gz"), "host01")
+        self.assertEqual(archive_stem("Host01.TGZ"), "Host01")
+        self.assertEqual(archive_stem("logs.v2.zip"), "logs.v2")
+
+    def test_safe_member_dir(self):
+        self.assertEqual(safe_member_dir("Security.evtx"), "")
+        self.assertEqual(safe_member_dir("hostA/sub/Security.evtx"), os.path.join("hostA", "sub"))
+        self.assertEqual(safe_member_dir("/../../etc/Security.evtx"), "etc")
+        self.assertEqual(safe_member_dir("C:\\..\\logs\\.\\Security.evtx"), os.path.join("C:", "logs"))
+
+
+@unittest.skipIf(ChunkHeader is None, "python-evtx is not installed")
+class ArchiveAnalysisTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp(prefix="archive_test_")
+        # 解压后的目录结构：plain/site1/bundle/成员目录/Security.evtx
+        cls.bundle_dir = os.path.join(cls.work_dir, "plain", "site1", "bundle")
+        cls.members = []
+        for i, (rel_dir, count) in enumerate(MEMBERS):
+            os.makedirs(os.path.join(cls.bundle_dir, rel_dir), exist_ok=True)
+            rel_path = os.path.join(rel_dir, "Security.evtx")
+            generate_evtx(os.path.join(cls.bundle_dir, rel_path), count, seed=i, computer=f"HOST-{i}")
+            cls.members.append(rel_path)
+
+        cls.expected_dir = os.path.join(cls.work_dir, "expected")
+        find_and_analyze_evtx_logs(os.path.join(cls.work_dir, "plain"), cls.expected_dir, target_event_ids=EVENT_IDS)
+        cls.expected = read_reports(cls.expected_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def build_archive(self, suffix, write):
+        """在 archives_<suffix>/site1/bundle<suffix> 中写入所有成员，返回日志根目录"""
+        root = os.path.join(self.work_dir, "archives" + suffix.replace('.', '_'))
+        os.makedirs(os.path.join(root, "site1"))
+        write(os.path.join(root, "site1", "bundle" + suffix),
+              [(os.path.join(self.bundle_dir, rel_path), rel_path.replace(os.sep, '/')) for rel_path in self.members])
+        return root
+
+    def check_archive(self, suffix, write):
+        root = self.build_archive(suffix, write)
+        output_dir = os.path.join(self.work_dir, "output" + suffix.replace('.', '_'))
+        find_and_analyze_evtx_logs(root, output_dir, target_event_ids=EVENT_IDS)
+
+        reports = read_reports(output_dir)
+        self.assertIn(os.path.join("site1", "bundle", "hostB", "sub", "4625.txt"), reports)
+        self.assertEqual(reports, self.expected)
+
+    def test_zip(self):
+        def write(path, files):
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for file_path, name in files:
+                    archive.write(file_path, name)
+        self.check_archive(".zip", write)
+
+    def test_tar_gz(self):
+        def write(path, files):
+            with tarfile.open(path, 'w:gz') as archive:
+                for file_path, name in files:
+                    archive.add(file_path, name)
+        self.check_archive(".tar.gz", write)
+
+    @unittest.skipIf(py7zr is None, "py7zr is not installed")
+    def test_7z(self):
+        def write(path, files):
+            with py7zr.SevenZipFile(path, 'w') as archive:
+                for file_path, name in files:
+                    archive.write(file_path, name)
+        self.check_archive(".7z", write)
+
+    def test_chunk_splitter_matches_file_chunks(self):
+        with open(os.path.join(self.bundle_dir, self.members[0]), 'rb') as f:
+            data = f.read()
+        expected = [data[ofs:ofs + CHUNK_SIZE] for ofs in range(FILE_HEADER_SIZE, len(data), CHUNK_SIZE)
+                    if data[ofs:ofs + 8] == CHUNK_MAGIC]
+        self.assertGreater(len(expected), 1)
+
+        rng = random.Random(0)
+        # 数据块边界落在文件头内、chunk 中间和 chunk 边界两侧
+        for sizes in ([len(data)], [FILE_HEADER_SIZE - 1, CHUNK_SIZE + 1], [1, 7, 4093, 65537, 100000]):
+            splitter = ChunkSplitter()
+            chunks = []
+            pos = 0
+            while pos < len(data):
+                size = rng.choice(sizes)
+                chunks.extend(splitter.feed(data[pos:pos + size]))
+                pos += size
+            self.assertTrue(splitter.valid)
+            self.assertEqual(chunks, expected, sizes)
+
+    def test_chunk_splitter_rejects_non_evtx_stream(self):
+        splitter = ChunkSplitter()
+        self.assertEqual(splitter.feed(b'PK\x03\x04' + bytes(FILE_HEADER_SIZE + CHUNK_SIZE)), [])
+        self.assertFalse(splitter.valid)
+        self.assertEqual(splitter.feed(CHUNK_MAGIC + bytes(CHUNK_SIZE)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+carver.py 的测试：salvage_chunk 恢复数据 CRC 失败的 chunk、损坏记录之后的记录仍被分析并计入 read_errors、
+重复出现的 chunk 只输出一次、跨越分段边界的 ElfChnk 签名能被找到。
+
+运行：python -m pytest -q tests
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carver import EvtxCarver, salvage_chunk
+from evtx_reader import ChunkHeader, EvtxChunk, FILE_HEADER_SIZE, CHUNK_SIZE, verify_chunk
+from evtx_generator import generate_evtx
+from event_log_analyzer import EventLogAnalyzer
+from handle.base import EventHandler
+from log_finder import analyze_image
+
+TARGET_EVENT_ID = 4625
+
+
+class RecordingHandler(EventHandler):
+    """只记录收到的记录号"""
+
+    def init_result(self):
+        self.results = set()
+        self.lock = threading.Lock()
+
+    def handle(self, event):
+        with self.lock:
+            self.results.add(event.RecordNumber)
+
+    def save_analyze_result(self, output_dir):
+        pass
+
+
+def target_records(chunk_buf):
+    chunk = EvtxChunk(chunk_buf, 0, {})
+    return [chunk.record_number(offset) for offset in chunk.record_offsets()
+            if chunk.event_id(offset) == TARGET_EVENT_ID]
+
+
+def corrupt_record(chunk_buf, record_number):
+    """把 chunk 中指定记录第一个替换值的类型改为无效值：记录框架完整，数据 CRC 失败，完整解析时抛出 KeyError"""
+    chunk_buf = bytearray(chunk_buf)
+    chunk = EvtxChunk(chunk_buf, 0, {})
+    offset = next(offset for offset in chunk.record_offsets() if chunk.record_number(offset) == record_number)
+    _, subs = chunk._root_layout(offset + 0x18)
+    chunk_buf[subs[0][0] - len(subs) * 4 + 2] = 0x7F
+    return bytes(chunk_buf)
+
+
+@unittest.skipIf(ChunkHeader is None, "python-evtx is not installed")
+class CarverTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp(prefix="carver_test_")
+        evtx_path = os.path.join(cls.work_dir, "Security.evtx")
+        generate_evtx(evtx_path, 3000, seed=5)
+        with open(evtx_path, 'rb') as f:
+            data = f.read()
+        cls.chunks = [data[ofs:ofs + CHUNK_SIZE] for ofs in range(FILE_HEADER_SIZE, len(data), CHUNK_SIZE)]
+        cls.good = cls.chunks[0]
+        numbers = target_records(cls.chunks[1])
+        cls.bad_record = numbers[len(numbers) // 2]
+        cls.damaged = corrupt_record(cls.chunks[1], cls.bad_record)
+        cls.damaged_targets = set(numbers) - {cls.bad_record}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def write_image(self, name, parts):
+        """parts 中的 int 表示该长度的随机填充，bytes 原样写入"""
+        rng = random.Random(name)
+        path = os.path.join(self.work_dir, name)
+        with open(path, 'wb') as f:
+            for part in parts:
+                f.write(rng.randbytes(part) if isinstance(part, int) else part)
+        return path
+
+    def carve(self, image_path, **kwargs):
+        carver = EvtxCarver(image_path, processes=2, **kwargs)
+        return carver, list(carver.iter_chunks())
+
+    def test_salvage_keeps_records_of_damaged_chunk(self):
+        self.assertTrue(verify_chunk(self.chunks[1], 0))
+        self.assertFalse(verify_chunk(self.damaged, 0))
+
+        salvaged = salvage_chunk(self.damaged, 0)
+        original = EvtxChunk(self.chunks[1], 0, {})
+        recovered = EvtxChunk(salvaged, 0, {})
+        self.assertEqual((recovered.first_record, recovered.last_record),
+                         (original.first_record, original.last_record))
+        self.assertEqual(len(list(recovered.record_offsets())), len(list(original.record_offsets())))
+
+    def test_records_after_damaged_record_are_analyzed(self):
+        image = self.write_image("damaged.dd", [5000, self.damaged, 3000])
+        carver = EvtxCarver(image, processes=2)
+        handler = RecordingHandler()
+        analyzer = EventLogAnalyzer(image, self.work_dir, backend='python')
+        analyzer.register_handler(TARGET_EVENT_ID, handler)
+        analyzer.run(chunks=carver.iter_chunks(), save_results=False)
+
+        self.assertEqual(carver.stats['chunks_salvaged'], 1)
+        self.assertEqual(handler.results, self.damaged_targets)
+        self.assertEqual(analyzer.read_errors, 1)
+
+        stats = analyze_image(image, os.path.join(self.work_dir, "damaged_out"), [TARGET_EVENT_ID], processes=2)
+        self.assertEqual(stats['read_errors'], 1)
+
+    def test_duplicate_chunks_are_yielded_once(self):
+        image = self.write_image("duplicates.dd", [100, self.good, 7, self.damaged, 4096, self.good, self.damaged, 9])
+        carver, chunks = self.carve(image)
+
+        self.assertEqual(chunks, [self.good, salvage_chunk(self.damaged, 0)])
+        self.assertEqual(carver.stats['chunks_valid'], 1)
+        self.assertEqual(carver.stats['chunks_salvaged'], 1)
+        self.assertEqual(carver.stats['chunks_duplicate'], 2)
+
+    def test_signature_across_segment_boundary(self):
+        # 签名从第二个分段末尾前 3 字节开始，跨到第三个分段
+        image = self.write_image("edge.dd", [2 * CHUNK_SIZE - 3, self.good, CHUNK_SIZE])
+        for segment_size in (CHUNK_SIZE, CHUNK_SIZE + 4096, 16 * CHUNK_SIZE):
+            carver, chunks = self.carve(image, segment_size=segment_size)
+            self.assertEqual(chunks, [self.good], segment_size)
+            self.assertEqual(carver.stats['chunks_duplicate'], 0)
+            self.assertEqual(carver.stats['bytes_scanned'], os.path.getsize(image))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+cluster.py 的本机多 worker 测试：结果与 find_and_analyze_evtx_logs 一致、worker 中途断开后单元重试、错误令牌被拒绝、
+超大或带 payload 的 hello 在令牌校验之前被拒绝、worker 全部崩溃时 run() 正常返回。
+
+运行：python -m pytest -q tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cluster
+from cluster import Coordinator, AnalysisWorker, send_message, read_message, HEADER_STRUCT, HELLO_MAX_SIZE
+from evtx_reader import ChunkHeader
+from evtx_generator import generate_evtx
+from log_finder import find_and_analyze_evtx_logs
+
+EVENT_IDS = [4625, 4688, 5156, 7045, 18456]
+
+
+class FlakyWorker(AnalysisWorker):
+    """收到第一个单元后直接断开连接，模拟 worker 中途退出"""
+
+    async def serve(self):
+        reader, writer = await self.connect()
+        await send_message(writer, {'type': 'hello', 'name': self.name, 'token': self.token})
+        await read_message(reader)
+        writer.close()
+
+
+async def send_raw_hello(port, data):
+    """发送原始的 hello 数据（长度前缀 + 头部），返回协调节点的回复头部"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(data)
+        await writer.drain()
+        header, _ = await read_message(reader)
+        return header
+    finally:
+        writer.close()
+
+
+def read_reports(root):
+    """{相对路径: 排序后的行}，多线程处理时同类记录的顺序不固定，因此按行排序后比较"""
+    reports = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, encoding='utf-8') as f:
+                reports[os.path.relpath(path, root)] = sorted(f.read().splitlines())
+    return reports
+
+
+@unittest.skipIf(ChunkHeader is None, "python-evtx is not installed")
+class ClusterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp(prefix="cluster_test_")
+        cls.log_dir = os.path.join(cls.work_dir, "logs")
+        for i, (rel_dir, count) in enumerate([("host1", 6000), ("host2", 3000), (os.path.join("host3", "sub"), 1000)]):
+            os.makedirs(os.path.join(cls.log_dir, rel_dir))
+            generate_evtx(os.path.join(cls.log_dir, rel_dir, "Security.evtx"), count, seed=i,
+                          computer=f"HOST-{i}")
+
+        cls.expected_dir = os.path.join(cls.work_dir, "expected")
+        find_and_analyze_evtx_logs(cls.log_dir, cls.expected_dir, target_event_ids=EVENT_IDS)
+        cls.expected = read_reports(cls.expected_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def output_dir(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def run_in_background(self, coordinator, local_workers):
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(failed=coordinator.run(local_workers=local_workers)))
+        thread.start()
+        return thread, result
+
+    def wait_for_port(self, coordinator, thread):
+        while coordinator.port == 0:
+            self.assertTrue(thread.is_alive(), "coordinator exited before listening")
+            thread.join(0.05)
+        return coordinator.port
+
+    def test_local_workers_match_single_node_reports(self):
+        output_dir = self.output_dir("local")
+        coordinator = Coordinator(self.log_dir, output_dir, target_event_ids=EVENT_IDS, port=0, chunks_per_unit=8)
+        failed = coordinator.run(local_workers=3)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(read_reports(output_dir), self.expected)
+
+    def test_worker_dropping_mid_unit_is_retried(self):
+        output_dir = self.output_dir("flaky")
+        coordinator = Coordinator(self.log_dir, output_dir, target_event_ids=EVENT_IDS, port=0, chunks_per_unit=1)
+        thread, result = self.run_in_background(coordinator, local_workers=0)
+        port = self.wait_for_port(coordinator, thread)
+
+        # 先让 FlakyWorker 拿到并丢掉一个单元，再启动正常 worker
+        FlakyWorker("127.0.0.1", port, name="flaky").run()
+        workers = [threading.Thread(target=AnalysisWorker("127.0.0.1", port, name=f"good-{i}").run)
+                   for i in range(3)]
+        for worker in workers:
+            worker.start()
+        thread.join(300)
+        for worker in workers:
+            worker.join(60)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result['failed'], [])
+        self.assertGreaterEqual(coordinator.retried_units, 1)
+        self.assertEqual(read_reports(output_dir), self.expected)
+
+    def test_bad_token_is_rejected(self):
+        output_dir = self.output_dir("token")
+        coordinator = Coordinator(self.log_dir, output_dir, target_event_ids=EVENT_IDS, port=0, token="secret")
+        thread, result = self.run_in_background(coordinator, local_workers=0)
+        port = self.wait_for_port(coordinator, thread)
+
+        intruder = threading.Thread(target=AnalysisWorker("127.0.0.1", port, token="wrong", name="intruder").run)
+        intruder.start()
+        intruder.join(30)
+        self.assertFalse(intruder.is_alive(), "rejected worker should exit instead of reconnecting")
+        self.assertEqual(coordinator.rejected_workers, 1)
+
+        AnalysisWorker("127.0.0.1", port, token="secret", name="good").run()
+        thread.join(300)
+        self.assertEqual(result['failed'], [])
+        self.assertEqual(read_reports(output_dir), self.expected)
+
+    def test_oversized_or_payload_hello_is_rejected(self):
+        output_dir = self.output_dir("hello")
+        coordinator = Coordinator(self.log_dir, output_dir, target_event_ids=EVENT_IDS, port=0, token="secret")
+        thread, result = self.run_in_background(coordinator, local_workers=0)
+        port = self.wait_for_port(coordinator, thread)
+
+        # 只发送长度前缀：协调节点不等待头部数据就拒绝
+        oversized = HEADER_STRUCT.pack(HELLO_MAX_SIZE + 1)
+        # 令牌正确但声明了 payload：在令牌校验之前拒绝，不读取 payload
+        hello = json.dumps({'type': 'hello', 'name': 'payload', 'token': 'secret', 'payload_size': 1 << 30}).encode()
+        with_payload = HEADER_STRUCT.pack(len(hello)) + hello
+        for data in (oversized, with_payload):
+            self.assertEqual(asyncio.run(send_raw_hello(port, data)), {'type': 'rejected', 'payload_size': 0})
+        self.assertEqual(coordinator.rejected_workers, 2)
+
+        AnalysisWorker("127.0.0.1", port, token="secret", name="good").run()
+        thread.join(300)
+        self.assertEqual(result['failed'], [])
+        self.assertEqual(read_reports(output_dir), self.expected)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork',
+                         "crashing analyze_unit is patched into local workers through fork")
+    def test_crashing_local_workers_do_not_hang(self):
+        def make_coordinator():
+            return Coordinator(self.log_dir, self.output_dir("crash"), target_event_ids=[4625], port=0,
+                               chunks_per_unit=64, max_retries=1)
+
+        unit_count = len(make_coordinator().plan_units())
+        original = cluster.AnalysisWorker.analyze_unit
+        cluster.AnalysisWorker.analyze_unit = lambda self, header, payload: os._exit(1)
+        try:
+            coordinator = make_coordinator()
+            failed = coordinator.run(local_workers=2)
+        finally:
+            cluster.AnalysisWorker.analyze_unit = original
+
+        # run() 返回，所有单元都记为失败且每个单元只记一次
+        self.assertEqual(sorted(unit.unit_id for unit in failed), list(range(unit_count)))
+        self.assertEqual(coordinator.remaining, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+dedup.py 的测试：RecordDeduplicator 的布隆过滤器未命中、命中后在内存精确集合中确认、命中后在 SQLite 溢出库中确认
+三条路径，以及 find_and_analyze_evtx_logs(dedup=True) 对重叠采集副本的合并结果。
+
+运行：python -m pytest -q tests
+"""
+
+import os
+import re
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import RecordDeduplicator
+from evtx_reader import ChunkHeader, EvtxFileReader
+from evtx_generator import generate_evtx
+from log_finder import find_and_analyze_evtx_logs
+
+
+def count_rows(deduplicator):
+    return deduplicator.db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+
+class RecordDeduplicatorTest(unittest.TestCase):
+    def test_bloom_miss_records_new_keys(self):
+        with RecordDeduplicator(expected_records=10000) as deduplicator:
+            for record_id in range(1000):
+                self.assertFalse(deduplicator.is_duplicate("HOST-A", "Security", record_id))
+            # 不同来源的相同记录号不是重复记录
+            self.assertFalse(deduplicator.is_duplicate("HOST-B", "Security", 1))
+            self.assertFalse(deduplicator.is_duplicate("HOST-A", "System", 1))
+            self.assertEqual(deduplicator.duplicates, 0)
+            self.assertEqual(len(deduplicator.pending), 1002)
+
+    def test_bloom_hit_confirmed_in_memory(self):
+        with RecordDeduplicator(expected_records=10000) as deduplicator:
+            for record_id in range(1000):
+                deduplicator.is_duplicate("HOST-A", "Security", record_id)
+            bloom_hits = deduplicator.bloom_hits
+            for record_id in range(1000):
+                # 计算机名和通道不区分大小写
+                self.assertTrue(deduplicator.is_duplicate("host-a", "SECURITY", record_id))
+            self.assertEqual(deduplicator.duplicates, 1000)
+            self.assertEqual(deduplicator.bloom_hits, bloom_hits + 1000)
+            self.assertEqual(count_rows(deduplicator), 0)
+
+    def test_bloom_false_positive_is_not_duplicate(self):
+        # 很小的布隆过滤器几乎总是命中，新记录必须由精确集合和溢出库否定
+        with RecordDeduplicator(expected_records=10, false_positive_rate=0.5, spill_threshold=50) as deduplicator:
+            for record_id in range(500):
+                self.assertFalse(deduplicator.is_duplicate("HOST-A", "Security", record_id))
+            self.assertGreater(deduplicator.bloom_hits, 0)
+            self.assertEqual(deduplicator.duplicates, 0)
+
+    def test_bloom_hit_confirmed_after_spill(self):
+        with RecordDeduplicator(expected_records=10000, spill_threshold=50) as deduplicator:
+            for record_id in range(5000):
+                self.assertFalse(deduplicator.is_duplicate("HOST-A", "Security", record_id))
+            self.assertLess(len(deduplicator.pending), 50)
+            self.assertEqual(count_rows(deduplicator) + len(deduplicator.pending), 5000)
+
+            for record_id in range(5000):
+                self.assertTrue(deduplicator.is_duplicate("HOST-A", "Security", record_id))
+            self.assertEqual(deduplicator.duplicates, 5000)
+
+    def test_close_removes_spill_file(self):
+        deduplicator = RecordDeduplicator(spill_threshold=10)
+        for record_id in range(100):
+            deduplicator.is_duplicate("HOST-A", "Security", record_id)
+        db_path = deduplicator.db_path
+        self.assertTrue(os.path.exists(db_path))
+        deduplicator.close()
+        deduplicator.close()
+        self.assertFalse(os.path.exists(db_path))
+
+
+def event_sources(path, event_id):
+    """文件中指定事件ID的记录的 (计算机名, 通道, 记录号)"""
+    keys = set()
+    with EvtxFileReader(path) as reader:
+        for chunk in reader.iter_chunks():
+            for offset in chunk.record_offsets():
+                if chunk.event_id(offset) == event_id:
+                    computer, channel = chunk.record_source(offset)
+                    keys.add((computer.lower(), channel.lower(), chunk.record_number(offset)))
+    return keys
+
+
+def total_events(report_path):
+    with open(report_path, encoding='utf-8') as f:
+        return int(re.search(r"^Total Events: (\d+)$", f.read(), re.MULTILINE).group(1))
+
+
+@unittest.skipIf(ChunkHeader is None, "python-evtx is not installed")
+class OverlappingCopiesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp(prefix="dedup_test_")
+        cls.log_dir = os.path.join(cls.work_dir, "logs")
+        # 同一主机的两份采集副本，记录号 2001-3000 重叠；另一台主机的记录号与之相同但不是重复记录
+        copies = [("collect1", "HOST-A", 1, 3000), ("collect2", "HOST-A", 2001, 3000), ("other", "HOST-B", 1, 1000)]
+        cls.paths = []
+        for i, (rel_dir, computer, first_record_id, count) in enumerate(copies):
+            os.makedirs(os.path.join(cls.log_dir, rel_dir))
+            path = os.path.join(cls.log_dir, rel_dir, "Security.evtx")
+            generate_evtx(path, count, seed=i, computer=computer, first_record_id=first_record_id)
+            cls.paths.append(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def test_overlapping_copies_are_counted_once(self):
+        # 去重只作用于通过事件ID过滤的记录，只注册 4625 时合并结果与遍历顺序无关
+        per_file = [event_sources(path, 4625) for path in self.paths]
+        unique = set().union(*per_file)
+        self.assertLess(len(unique), sum(len(keys) for keys in per_file))
+
+        output_dir = os.path.join(self.work_dir, "dedup")
+        find_and_analyze_evtx_logs(self.log_dir, output_dir, target_event_ids=[4625], dedup=True)
+        self.assertEqual(os.listdir(output_dir), ["4625.txt"])
+        self.assertEqual(total_events(os.path.join(output_dir, "4625.txt")), len(unique))
+
+        output_dir = os.path.join(self.work_dir, "merged")
+        find_and_analyze_evtx_logs(self.log_dir, output_dir, target_event_ids=[4625], merge_results=True)
+        self.assertEqual(total_events(os.path.join(output_dir, "4625.txt")), sum(len(keys) for keys in per_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
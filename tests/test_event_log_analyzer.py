@@ -0,0 +1,103 @@
+"""
+event_log_analyzer.py 纯 Python 后端的测试：单条记录的 BinXML 损坏时只跳过该记录，同一生产者范围内后面的记录照常处理，
+PipelineMetrics 的各阶段计数保持一致。
+
+运行：python -m pytest -q tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evtx_reader import ChunkHeader, EvtxFileReader
+from evtx_generator import generate_evtx
+from event_log_analyzer import EventLogAnalyzer
+from handle.base import EventHandler
+from metrics import PipelineMetrics
+
+TARGET_EVENT_ID = 4625
+
+
+class RecordingHandler(EventHandler):
+    """只记录收到的记录号"""
+
+    def init_result(self):
+        self.results = set()
+        self.lock = threading.Lock()
+
+    def handle(self, event):
+        with self.lock:
+            self.results.add(event.RecordNumber)
+
+    def save_analyze_result(self, output_dir):
+        pass
+
+
+def corrupt_record(path, record_number):
+    """把指定记录第一个替换值的类型改为无效值：记录框架和事件ID仍然正确，但完整解析时抛出 KeyError"""
+    with EvtxFileReader(path) as reader:
+        for chunk in reader.iter_chunks():
+            for offset in chunk.record_offsets():
+                if chunk.record_number(offset) != record_number:
+                    continue
+                _, subs = chunk._root_layout(offset + 0x18)
+                type_offset = subs[0][0] - len(subs) * 4 + 2
+                break
+            else:
+                continue
+            break
+    with open(path, 'r+b') as f:
+        f.seek(type_offset)
+        f.write(b'\x7f')
+
+
+def target_records(path):
+    """文件中事件ID为 TARGET_EVENT_ID 的记录号，以及每个 chunk 中这类记录的记录号列表"""
+    per_chunk = []
+    with EvtxFileReader(path) as reader:
+        for chunk in reader.iter_chunks():
+            per_chunk.append([chunk.record_number(offset) for offset in chunk.record_offsets()
+                              if chunk.event_id(offset) == TARGET_EVENT_ID])
+    return {number for numbers in per_chunk for number in numbers}, per_chunk
+
+
+@unittest.skipIf(ChunkHeader is None, "python-evtx is not installed")
+class CorruptedRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="analyzer_test_")
+        self.evtx_path = os.path.join(self.work_dir, "Security.evtx")
+        generate_evtx(self.evtx_path, 3000, seed=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_corrupted_record_is_skipped(self):
+        expected, per_chunk = target_records(self.evtx_path)
+        # 选一个 chunk 中间的记录，后面还有同类记录
+        chunk_numbers = next(numbers for numbers in per_chunk if len(numbers) >= 3)
+        bad_record = chunk_numbers[len(chunk_numbers) // 2]
+        corrupt_record(self.evtx_path, bad_record)
+
+        metrics = PipelineMetrics()
+        handler = RecordingHandler()
+        analyzer = EventLogAnalyzer(self.evtx_path, self.work_dir, metrics=metrics, backend='python')
+        analyzer.register_handler(TARGET_EVENT_ID, handler)
+        analyzer.run(num_producers=2, num_workers=2, save_results=False)
+
+        self.assertEqual(handler.results, expected - {bad_record})
+        counters = metrics.counters
+        self.assertEqual(counters['read_errors'], 1)
+        self.assertEqual(counters['scanned'], 3000)
+        self.assertEqual(counters['scanned'], counters['filtered'] + counters['deduplicated']
+                         + counters['enqueued'] + counters['read_errors'])
+        self.assertEqual(counters['enqueued'], len(expected) - 1)
+        self.assertEqual(counters['handled'], counters['enqueued'])
+
+
+if __name__ == "__main__":
+    unittest.main()